@@ -1,8 +1,12 @@
 from flask import Flask
 from flask_cors import CORS
 from routes import register_routes
+from encoders import FastJSONProvider
+from metrics import init_metrics
 from db_operations import initialize_db
-from news_analysis import fetch_and_cache_news
+from news_analysis import start_news_refresher
+from utils import MappingRegistry
+import importlib
 import logging
 import os
 
@@ -10,12 +14,31 @@ import os
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def create_app():
-    """Create and configure the Flask application."""
+# Slow imports that the request handlers defer until first use
+HEAVY_MODULES = ['sklearn.ensemble', 'statsmodels.tsa.arima.model', 'scipy.signal', 'yfinance', 'joblib']
+
+def preload():
+    """Import the deferred modules now, e.g. in a server master before it forks workers."""
+    for name in HEAVY_MODULES:
+        importlib.import_module(name)
+
+def start_background_tasks():
+    """Start the threads a serving process needs; threads do not survive a fork."""
+    # Fetch news articles in the background instead of delaying startup
+    start_news_refresher(fetch_first=True)
+
+def create_app(start_background=True):
+    """Create and configure the Flask application.
+
+    A pre-forking server passes `start_background=False` and calls
+    `start_background_tasks` in each worker instead (see gunicorn.conf.py).
+    """
     app = Flask(__name__)
+    # Encodes NumPy/pandas values and picks orjson or a binary format when available
+    app.json = FastJSONProvider(app)
 
     # Configure CORS
-    CORS(app, resources={r"/*": {"origins": "*"}})
+    CORS(app, resources={r"/*": {"origins": "*"}}, expose_headers=["X-Failed-Symbols", "ETag", "Server-Timing"])
 
     try:
         # Initialize the database
@@ -23,13 +46,22 @@ def create_app():
         initialize_db(app)
         logger.info('Database connected successfully.')
 
-        # Fetch and cache news articles
-        logger.info('Fetching and caching news articles...')
-        fetch_and_cache_news()
-        logger.info('News articles fetched and cached successfully.')
+        # Load company mappings once; they reload themselves when the CSV changes
+        app.extensions['mappings'] = MappingRegistry()
+        logger.info('Company mappings loaded.')
+
+        if start_background:
+            start_background_tasks()
+            logger.info('News articles are being fetched in the background.')
+
+        if os.getenv('PRELOAD_HEAVY_IMPORTS', 'False').lower() in ['true', '1', 't']:
+            preload()
+            logger.info('Model libraries preloaded.')
 
         # Register routes
         register_routes(app)
+        # Request timing, /metrics and the X-Profile breakdown
+        init_metrics(app)
         logger.info('Routes registered and connection established.')
 
     except Exception as e:
@@ -0,0 +1,82 @@
+"""Safe file replacement for the on-disk stores.
+
+The same file can be written at once by request threads, the model process
+pool and the server's worker processes. `atomic_write` gives every writer
+its own temporary file next to the target and renames it into place, and
+`file_lock` serializes read-modify-write sequences across processes.
+Locks use flock on POSIX systems and msvcrt.locking on Windows.
+"""
+import os
+import tempfile
+from contextlib import contextmanager
+
+if os.name == 'nt':
+    import msvcrt
+
+    def _lock(f, blocking):
+        # Lock the first byte; LK_LOCK gives up after ten seconds, so keep waiting
+        f.seek(0)
+        while True:
+            try:
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+                return
+            except OSError:
+                if not blocking:
+                    raise
+
+    def _unlock(f):
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+else:
+    import fcntl
+
+    def _lock(f, blocking):
+        fcntl.flock(f, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+    def _unlock(f):
+        fcntl.flock(f, fcntl.LOCK_UN)
+
+
+@contextmanager
+def atomic_write(path, mode='w'):
+    """Open a private temporary file that replaces `path` when the block exits cleanly."""
+    directory = os.path.dirname(path) or '.'
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f'.{os.path.basename(path)}.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, mode) as f:
+            yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+@contextmanager
+def file_lock(path):
+    """Hold an exclusive lock on `path` (created if missing) for the block."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'a') as f:
+        _lock(f, blocking=True)
+        try:
+            yield
+        finally:
+            _unlock(f)
+
+
+def try_lock(path):
+    """Take an exclusive lock on `path` without waiting.
+
+    Returns the open lock file, which holds the lock until it is closed, or
+    None if another process holds it.
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    f = open(path, 'a')
+    try:
+        _lock(f, blocking=False)
+    except OSError:
+        f.close()
+        return None
+    return f
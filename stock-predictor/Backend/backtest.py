@@ -0,0 +1,188 @@
+"""Walk-forward backtest of the short- and long-term models on stored prices.
+
+Replays OHLCV history from CSV fixtures (`<dir>/<SYMBOL>.csv`), the local
+price store, or seeded synthetic bars, without touching the network. For
+every symbol the models are re-run at evenly spaced cut-off dates using only
+the bars up to that date, and the predictions are scored against the bars
+that followed. Symbols are evaluated in parallel processes.
+
+    python backtest.py --fixtures fixtures/ --steps 40 --every 5
+    python backtest.py --store --symbols TCS.NS INFY.NS
+    python backtest.py --synthetic 4
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import warnings
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from long_term import LONG_TERM_HORIZON, LongTermForecaster
+from price_store import DEFAULT_STORE_DIR, CsvFixtureFetcher, PriceStore
+from feature_profiles import load_profile
+from stock_analysis import FEATURE_COLUMNS, FOREST_TREES, PRICE_TARGETS, calculate_indicators, fit_forest
+
+STAGES = ['indicators', 'fit', 'predict', 'long_fit', 'long_predict']
+
+
+class StageTimer:
+    """Collects wall-clock durations per stage name."""
+
+    def __init__(self):
+        self.durations = defaultdict(list)
+
+    def run(self, stage, func, *args, **kwargs):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        self.durations[stage].append(time.perf_counter() - start)
+        return result
+
+
+def short_term_step(history, timer, n_estimators, columns=FEATURE_COLUMNS):
+    """Next-bar predictions from the same stages as `short_term_analysis` (non-incremental)."""
+    data = timer.run('indicators', calculate_indicators, history, columns)
+    X = data[columns]
+    model = timer.run('fit', fit_forest, X, data[PRICE_TARGETS], n_estimators=n_estimators, n_jobs=1)
+    predicted = timer.run('predict', model.predict, X.iloc[[-1]])[0]
+    return dict(zip(PRICE_TARGETS, predicted))
+
+
+def walk_forward(symbol, data, steps=20, every=5, n_estimators=FOREST_TREES, long_term=True, columns=FEATURE_COLUMNS):
+    """Evaluate one symbol at `steps` cut-offs spaced `every` bars apart."""
+    warnings.simplefilter('ignore')
+    timer = StageTimer()
+    state_dir = tempfile.TemporaryDirectory(prefix='backtest-arima-')
+    forecaster = LongTermForecaster(root=state_dir.name)
+    horizon = LONG_TERM_HORIZON if long_term else 1
+    last_cutoff = len(data) - 1 - horizon
+    cutoffs = [last_cutoff - every * i for i in reversed(range(steps)) if last_cutoff - every * i > 200]
+    records = []
+    for cutoff in cutoffs:
+        history = data.iloc[:cutoff + 1]
+        actual = data.iloc[cutoff + 1]
+        record = {'symbol': symbol, 'date': history.index[-1].strftime('%Y-%m-%d'), 'close': history['Close'].iloc[-1]}
+        predicted = short_term_step(history, timer, n_estimators, columns)
+        for target in PRICE_TARGETS:
+            record[f'predicted_{target}'] = predicted[target]
+            record[f'actual_{target}'] = actual[target]
+        if long_term:
+            timer.run('long_fit', forecaster.results, symbol, history)
+            path = timer.run('long_predict', forecaster.forecast, symbol, history)
+            actual_path = data['Close'].iloc[cutoff + 1:cutoff + 1 + len(path)].to_numpy()
+            record['long_predicted'] = path.iloc[-1]
+            record['long_actual'] = actual_path[-1]
+            record['long_path_mape'] = float(np.mean(np.abs(path.to_numpy() - actual_path) / actual_path)) * 100
+        records.append(record)
+    state_dir.cleanup()
+    return records, dict(timer.durations)
+
+
+def mape(predicted, actual):
+    predicted, actual = np.asarray(predicted, dtype=float), np.asarray(actual, dtype=float)
+    return float(np.mean(np.abs(predicted - actual) / np.abs(actual))) * 100
+
+
+def summarize(records, durations):
+    frame = pd.DataFrame(records)
+    accuracy = {}
+    for target in PRICE_TARGETS:
+        accuracy[f'{target} MAPE %'] = mape(frame[f'predicted_{target}'], frame[f'actual_{target}'])
+    # Yesterday's close as the prediction; a model should beat this
+    accuracy['naive Close MAPE %'] = mape(frame['close'], frame['actual_Close'])
+    predicted_move = np.sign(frame['predicted_Close'] - frame['close'])
+    actual_move = np.sign(frame['actual_Close'] - frame['close'])
+    accuracy['Close direction hit %'] = float((predicted_move == actual_move).mean()) * 100
+    if 'long_predicted' in frame:
+        accuracy[f'long-term {LONG_TERM_HORIZON}d MAPE %'] = mape(frame['long_predicted'], frame['long_actual'])
+        accuracy['long-term path MAPE %'] = float(frame['long_path_mape'].mean())
+    timing = {}
+    for stage in STAGES:
+        values = np.asarray(durations.get(stage, []))
+        if len(values):
+            timing[stage] = {
+                'calls': len(values),
+                'mean_ms': float(values.mean()) * 1000,
+                'p50_ms': float(np.percentile(values, 50)) * 1000,
+                'p95_ms': float(np.percentile(values, 95)) * 1000,
+            }
+    return {'evaluations': len(frame), 'symbols': int(frame['symbol'].nunique()), 'accuracy': accuracy, 'timing': timing}
+
+
+def load_histories(args):
+    if args.synthetic:
+        from benchmarks import make_fixture_ohlcv
+        return {f'SYNTH{i}': make_fixture_ohlcv(args.rows, seed=i) for i in range(args.synthetic)}
+    if args.fixtures:
+        fetcher = CsvFixtureFetcher(args.fixtures)
+        symbols = args.symbols or sorted(name[:-4] for name in os.listdir(args.fixtures) if name.endswith('.csv'))
+        return {symbol: fetcher.fetch(symbol) for symbol in symbols}
+    store = PriceStore(root=args.store)
+    symbols = args.symbols or (sorted(os.listdir(store.root)) if os.path.isdir(store.root) else [])
+    # Only what is already on disk; the backtest never downloads
+    histories = {symbol: store.load(symbol) for symbol in symbols}
+    return {symbol: data for symbol, data in histories.items() if data is not None}
+
+
+def run(histories, steps, every, n_estimators, long_term=True, workers=None, columns=FEATURE_COLUMNS):
+    records, durations = [], defaultdict(list)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(walk_forward, symbol, data, steps, every, n_estimators, long_term, columns)
+            for symbol, data in histories.items()
+        ]
+        for future in futures:
+            symbol_records, symbol_durations = future.result()
+            records.extend(symbol_records)
+            for stage, values in symbol_durations.items():
+                durations[stage].extend(values)
+    return records, durations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--fixtures', help='directory of <SYMBOL>.csv OHLCV files')
+    source.add_argument('--store', nargs='?', const=DEFAULT_STORE_DIR, help='price store directory (default: PRICE_STORE_DIR)')
+    source.add_argument('--synthetic', type=int, help='number of seeded random-walk symbols')
+    parser.add_argument('--symbols', nargs='*', help='limit to these symbols')
+    parser.add_argument('--rows', type=int, default=1500, help='bars per synthetic symbol')
+    parser.add_argument('--steps', type=int, default=20, help='cut-off dates per symbol')
+    parser.add_argument('--every', type=int, default=5, help='bars between cut-off dates')
+    parser.add_argument('--trees', type=int, default=FOREST_TREES)
+    parser.add_argument('--profile', help='feature profile to evaluate (default: FEATURE_PROFILE)')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--no-long-term', dest='long_term', action='store_false')
+    parser.add_argument('--json', help='also write the summary and every evaluation to this file')
+    args = parser.parse_args()
+
+    histories = {symbol: data for symbol, data in load_histories(args).items() if not data.empty}
+    if not histories:
+        parser.error('no price history found')
+    start = time.perf_counter()
+    columns = load_profile(args.profile)
+    records, durations = run(histories, args.steps, args.every, args.trees, args.long_term, args.workers, columns)
+    if not records:
+        parser.error('not enough history for any cut-off date')
+    summary = summarize(records, durations)
+    summary['wall_seconds'] = time.perf_counter() - start
+
+    summary['features'] = len(columns)
+    print(f"{summary['evaluations']} evaluations over {summary['symbols']} symbols "
+          f"with {len(columns)} features in {summary['wall_seconds']:.1f}s")
+    for name, value in summary['accuracy'].items():
+        print(f'{name:>26}: {value:.3f}')
+    for stage, stats in summary['timing'].items():
+        print(f"{stage:>26}: mean {stats['mean_ms']:.1f}ms  p50 {stats['p50_ms']:.1f}ms  "
+              f"p95 {stats['p95_ms']:.1f}ms  ({stats['calls']} calls)")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'summary': summary, 'evaluations': records}, f, indent=2, default=float)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from http_client import concurrently
+from price_store import get_store
+from metrics import span
+from quotes import get_quotes
+from singleflight import get_group
+from stock_analysis import short_term_analysis, long_term_analysis
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Process pool for model fitting, sized to the machine's cores by default.
+
+    Workers come from a fork server rather than forking the threaded server
+    process, which could hand a child a lock held by another thread. Where
+    there is no fork server (Windows) they are spawned.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            workers = int(os.getenv('PREDICT_WORKERS', os.cpu_count() or 1))
+            if 'forkserver' in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context('forkserver')
+                # Imported once in the fork server instead of in every worker
+                context.set_forkserver_preload(['batch_predict'])
+            else:
+                context = multiprocessing.get_context('spawn')
+            _executor = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+        return _executor
+
+
+def _discard_executor(executor):
+    """Drop a broken pool (e.g. a worker was killed) so the next call starts a new one."""
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False)
+
+
+def _submit(executor, ticker, data):
+    try:
+        return executor.submit(_predict_symbol, ticker, data)
+    except BrokenProcessPool:
+        _discard_executor(executor)
+        return get_executor().submit(_predict_symbol, ticker, data)
+
+
+def _predict_symbol(symbol, data):
+    if len(data) < 2:
+        raise ValueError('Insufficient data')
+    return {
+        'short_term': short_term_analysis(data.copy(), symbol),
+        'long_term': long_term_analysis(symbol, data),
+    }
+
+
+def predict_batch(symbols):
+    """Predict short and long term prices for many symbols at once.
+
+    All price history is refreshed with one bulk download while current
+    prices come from the quote cache at the same time; the model fits then
+    run in the process pool. Returns `(results, errors)` so that one failing symbol does
+    not cost the caller the rest of the batch. If the pool breaks, it is
+    replaced and the symbols it lost are tried once more.
+    """
+    symbols = list(dict.fromkeys(symbols))
+    tickers = {symbol: symbol + '.NS' for symbol in symbols}
+    results, errors = {}, {}
+    if not symbols:
+        return results, errors
+
+    store = get_store()
+    with span('batch_refresh'):
+        histories, current_prices = concurrently(
+            lambda: store.refresh_many(list(tickers.values())),
+            lambda: get_quotes(symbols),
+        )
+
+    pending = {}
+    for symbol, ticker in tickers.items():
+        data = histories.get(ticker)
+        if data is None or symbol not in current_prices:
+            errors[symbol] = 'No price data available'
+            continue
+        pending[symbol] = (ticker, data)
+
+    for attempt in range(2):
+        executor = get_executor()
+        futures = {}
+        for symbol, (ticker, data) in pending.items():
+            # Concurrent batches holding the same symbol share its model fits
+            key = (ticker, str(data.index[-1].date()) if len(data) else None)
+            futures[symbol] = get_group('batch_predict').share(
+                key, lambda ticker=ticker, data=data: _submit(executor, ticker, data)
+            )
+
+        lost = {}
+        # Waiting on the pool; the stages inside the workers are not visible here
+        with span('batch_fits'):
+            for symbol, future in futures.items():
+                try:
+                    prediction = dict(future.result())
+                except BrokenProcessPool as e:
+                    lost[symbol] = pending[symbol]
+                    errors[symbol] = str(e)
+                    continue
+                except Exception as e:
+                    logger.warning(f'Prediction failed for {symbol}: {e}')
+                    errors[symbol] = str(e)
+                    continue
+                prediction['current_price'] = current_prices[symbol]
+                results[symbol] = prediction
+                errors.pop(symbol, None)
+        if not lost:
+            break
+        logger.warning(f'Model process pool broke; {len(lost)} symbols lost their fits')
+        _discard_executor(executor)
+        pending = lost
+    return results, errors
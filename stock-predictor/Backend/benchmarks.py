@@ -0,0 +1,463 @@
+"""Offline micro-benchmarks for the prediction pipeline.
+
+Run with `python benchmarks.py <name>`; every benchmark works on a seeded
+synthetic OHLCV fixture so results are comparable between runs.
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+
+def make_fixture_ohlcv(rows=1500, seed=42):
+    """Deterministic random-walk daily bars shaped like a yfinance download."""
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range(end='2024-12-31', periods=rows, name='Date')
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, rows)))
+    open_ = close * (1 + rng.normal(0, 0.003, rows))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.005, rows)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.005, rows)))
+    volume = rng.integers(100_000, 1_000_000, rows).astype(float)
+    return pd.DataFrame({'Open': open_, 'High': high, 'Low': low, 'Close': close, 'Volume': volume}, index=index)
+
+
+def timed(func, *args, repeat=3, **kwargs):
+    """Best wall-clock time of `repeat` runs and the last result."""
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def bench_short_term(rows=1500, n_estimators=100, n_jobs=1):
+    from stock_analysis import (PRICE_TARGETS, calculate_indicators,
+                                predict_prices, predict_prices_joint)
+
+    data = calculate_indicators(make_fixture_ohlcv(rows)).dropna()
+
+    def separate():
+        return {target: predict_prices(data, target) for target in PRICE_TARGETS}
+
+    def joint():
+        return predict_prices_joint(data, PRICE_TARGETS, n_estimators=n_estimators, n_jobs=n_jobs)
+
+    separate_time, separate_result = timed(separate)
+    joint_time, joint_result = timed(joint)
+    print(f'{len(PRICE_TARGETS)} separate forests: {separate_time:.3f}s')
+    print(f'joint forest ({n_estimators} trees, n_jobs={n_jobs}): {joint_time:.3f}s')
+    print(f'speedup: {separate_time / joint_time:.2f}x')
+    for target in PRICE_TARGETS:
+        print(f'  {target}: separate {separate_result[target]:.2f}, joint {joint_result[target]:.2f}')
+
+
+def ta_reference():
+    """The `ta` call the models were built on for every engine column, as `{column: f(data)}`."""
+    import ta
+
+    def fibonacci(ratio):
+        return lambda d: pd.Series(d['Close'].max() - ratio * (d['Close'].max() - d['Close'].min()), index=d.index)
+
+    return {
+        'SMA_30': lambda d: ta.trend.sma_indicator(d['Close'], window=30),
+        'SMA_100': lambda d: ta.trend.sma_indicator(d['Close'], window=100),
+        'RSI': lambda d: ta.momentum.RSIIndicator(d['Close']).rsi(),
+        'MFI': lambda d: ta.volume.MFIIndicator(high=d['High'], low=d['Low'], close=d['Close'], volume=d['Volume']).money_flow_index(),
+        'OBV': lambda d: ta.volume.OnBalanceVolumeIndicator(d['Close'], d['Volume']).on_balance_volume(),
+        'ATR': lambda d: ta.volatility.average_true_range(d['High'], d['Low'], d['Close']),
+        'EMA_20': lambda d: ta.trend.ema_indicator(d['Close'], window=20),
+        'EMA_50': lambda d: ta.trend.ema_indicator(d['Close'], window=50),
+        'EMA_100': lambda d: ta.trend.ema_indicator(d['Close'], window=100),
+        'EMA_200': lambda d: ta.trend.ema_indicator(d['Close'], window=200),
+        'MACD': lambda d: ta.trend.macd(d['Close']),
+        'MACD Signal': lambda d: ta.trend.macd_signal(d['Close']),
+        'MACD Histogram': lambda d: ta.trend.macd_diff(d['Close']),
+        'ADX': lambda d: ta.trend.ADXIndicator(d['High'], d['Low'], d['Close']).adx(),
+        'Williams %R': lambda d: ta.momentum.williams_r(d['High'], d['Low'], d['Close']),
+        'Stochastic Oscillator': lambda d: ta.momentum.stoch(d['High'], d['Low'], d['Close']),
+        'CCI': lambda d: ta.trend.cci(d['High'], d['Low'], d['Close']),
+        'ROC': lambda d: ta.momentum.roc(d['Close']),
+        'Bollinger High': lambda d: ta.volatility.bollinger_hband(d['Close']),
+        'Bollinger Low': lambda d: ta.volatility.bollinger_lband(d['Close']),
+        'Stochastic RSI': lambda d: ta.momentum.stochrsi(d['Close']),
+        'TSI': lambda d: ta.momentum.tsi(d['Close']),
+        'DPO': lambda d: ta.trend.dpo(d['Close']),
+        'Vortex Indicator Positive': lambda d: ta.trend.vortex_indicator_pos(d['High'], d['Low'], d['Close']),
+        'Vortex Indicator Negative': lambda d: ta.trend.vortex_indicator_neg(d['High'], d['Low'], d['Close']),
+        'TRIX': lambda d: ta.trend.trix(d['Close']),
+        'DMI+': lambda d: ta.trend.adx_pos(d['High'], d['Low'], d['Close']),
+        'DMI-': lambda d: ta.trend.adx_neg(d['High'], d['Low'], d['Close']),
+        'Ulcer Index': lambda d: ta.volatility.ulcer_index(d['Close']),
+        'Donchian Channel High': lambda d: ta.volatility.donchian_channel_hband(d['High'], d['Low'], close=d['Close'], window=20),
+        'Donchian Channel Low': lambda d: ta.volatility.donchian_channel_lband(d['High'], d['Low'], close=d['Close'], window=20),
+        'Mass Index': lambda d: ta.trend.mass_index(d['High'], d['Low']),
+        'CMF': lambda d: ta.volume.ChaikinMoneyFlowIndicator(d['High'], d['Low'], d['Close'], d['Volume']).chaikin_money_flow(),
+        'Aroon Up': lambda d: ta.trend.aroon_up(d['High'], d['Low'], window=25),
+        'Aroon Down': lambda d: ta.trend.aroon_down(d['High'], d['Low'], window=25),
+        'Fibonacci Level 0.0': fibonacci(0.0),
+        'Fibonacci Level 0.236': fibonacci(0.236),
+        'Fibonacci Level 0.382': fibonacci(0.382),
+        'Fibonacci Level 0.618': fibonacci(0.618),
+        'Fibonacci Level 1.0': fibonacci(1.0),
+    }
+
+
+def calculate_indicators_ta(data):
+    """Reference indicator set built from individual `ta` calls."""
+    data = data.copy()
+    for column, indicator in ta_reference().items():
+        data[column] = indicator(data)
+    return data
+
+
+def check_indicator_parity(data, rtol=1e-7, atol=1e-8):
+    """Assert the vectorized engine matches `ta` on every column it supports."""
+    from indicators import INDICATORS, compute_indicators
+
+    columns = list(INDICATORS)
+    expected = calculate_indicators_ta(data)[columns]
+    actual = compute_indicators(data, columns)
+    mismatched = []
+    for column in columns:
+        if not np.allclose(actual[column], expected[column], rtol=rtol, atol=atol, equal_nan=True):
+            mismatched.append(column)
+    if mismatched:
+        raise AssertionError(f"Indicator mismatch against ta: {', '.join(mismatched)}")
+    print(f'parity: {len(columns)} columns match ta over {len(data)} rows')
+
+
+def bench_indicators(rows=1500):
+    from indicators import INDICATORS, compute_indicators
+
+    data = make_fixture_ohlcv(rows)
+    check_indicator_parity(data)
+    columns = list(INDICATORS)
+    ta_time, _ = timed(calculate_indicators_ta, data)
+    engine_time, _ = timed(compute_indicators, data, columns)
+    print(f'ta, {len(columns)} columns: {ta_time:.3f}s')
+    print(f'engine, {len(columns)} columns: {engine_time:.3f}s')
+    print(f'speedup: {ta_time / engine_time:.1f}x')
+
+
+def bench_streaming(rows=1500):
+    """Cost of refreshing features for one new bar: full recompute vs incremental state."""
+    import copy
+
+    from indicators import compute_indicators
+    from streaming_indicators import STREAMING_COLUMNS, IndicatorState
+
+    data = make_fixture_ohlcv(rows + 1)
+    history, new_bar = data.iloc[:-1], data.iloc[[-1]]
+
+    state = IndicatorState()
+    state.extend(history)
+    incremental = state.extend(new_bar)
+    full = compute_indicators(data, STREAMING_COLUMNS).iloc[[-1]]
+    if not np.allclose(incremental, full, rtol=1e-9, atol=1e-8, equal_nan=True):
+        raise AssertionError('Incremental features differ from a full recompute')
+    print(f'parity: incremental row matches full recompute on {len(STREAMING_COLUMNS)} columns')
+
+    full_time, _ = timed(compute_indicators, data, STREAMING_COLUMNS, repeat=20)
+
+    # Apply the same bar to fresh copies of the state so every run does identical work
+    copies = [copy.deepcopy(state) for _ in range(200)]
+    bar = new_bar[['Open', 'High', 'Low', 'Close', 'Volume']].iloc[0].tolist()
+    start = time.perf_counter()
+    for copied in copies:
+        copied.update(new_bar.index[0], *bar)
+    update_time = (time.perf_counter() - start) / len(copies)
+    print(f'full recompute over {rows} bars: {full_time * 1000:.2f}ms')
+    print(f'incremental update of one bar: {update_time * 1000:.3f}ms')
+    print(f'speedup: {full_time / update_time:.0f}x')
+
+
+COMPANY_NAMES_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'full_company_names.csv')
+HEADLINE_TEMPLATES = [
+    '{} shares rally after strong performance in Q2',
+    'Analysts say {} is a good buy ahead of results',
+    'Positive outlook for {} as orders rise',
+    'Markets close flat; {} and peers trade sideways',
+    'Sensex ends higher led by banking stocks',
+]
+
+
+def make_headlines(names, count=10_000, seed=42):
+    """Synthetic headlines, most of them naming one company from `names`."""
+    rng = np.random.default_rng(seed)
+    templates = rng.integers(0, len(HEADLINE_TEMPLATES), count)
+    picks = rng.integers(0, len(names), count)
+    return [HEADLINE_TEMPLATES[t].format(names[p]).lower() for t, p in zip(templates, picks)]
+
+
+def bench_matcher(count=10_000, baseline_sample=500):
+    from utils import CompanyMatcher, load_mappings, preprocess_company_name
+
+    def substring_scan(title, mappings):
+        # Matching as it was done before the token index
+        for company_name, symbol in mappings.items():
+            for suffix in ['limited', 'ltd', 'corp', 'inc', 'llc']:
+                company_name = company_name.replace(suffix, '').strip()
+            if company_name in title:
+                return symbol
+        return None
+
+    mappings = load_mappings(COMPANY_NAMES_CSV)
+    names = [preprocess_company_name(name) for name in pd.read_csv(COMPANY_NAMES_CSV)['CompanyName']]
+    headlines = make_headlines(names, count)
+
+    build_time, matcher = timed(CompanyMatcher, mappings, repeat=1)
+    match_time, matches = timed(lambda: [matcher.find_all(title) for title in headlines], repeat=1)
+    sample = headlines[:baseline_sample]
+    scan_time, _ = timed(lambda: [substring_scan(title, mappings) for title in sample], repeat=1)
+    scan_time *= len(headlines) / len(sample)
+
+    matched = sum(1 for symbols in matches if symbols)
+    print(f'{len(mappings)} companies, {len(headlines)} headlines, {matched} with a match')
+    print(f'token index: build {build_time * 1000:.1f}ms, match {match_time:.3f}s')
+    print(f'substring scan (extrapolated from {len(sample)}): {scan_time:.1f}s')
+    print(f'speedup: {scan_time / match_time:.0f}x')
+
+
+def bench_serialization(rows=1500):
+    import json
+
+    from flask import Flask
+    from flask.json.provider import DefaultJSONProvider
+
+    import encoders
+    from stock_data import history_columns
+
+    data = make_fixture_ohlcv(rows)
+    stock_info = {'longName': 'Fixture Ltd', 'sector': 'Industrials', 'currentPrice': float(data['Close'].iloc[-1])}
+    # Row records with Timestamps, as the endpoint used to return them
+    records = {'stock_info': stock_info, 'stock_history': data.reset_index().to_dict(orient='records')}
+    columns = {'stock_info': stock_info, 'stock_history': history_columns(data)}
+    app = Flask(__name__)
+    flask_json = DefaultJSONProvider(app)
+    fast_json = encoders.FastJSONProvider(app)
+
+    encodings = {
+        'rows, flask json': lambda: flask_json.dumps(records).encode(),
+        'columns, flask json': lambda: flask_json.dumps(columns).encode(),
+        'columns, stdlib json': lambda: json.dumps(columns, default=encoders.to_builtin).encode(),
+    }
+    if encoders.orjson is not None:
+        encodings['rows, orjson'] = lambda: fast_json.dumps(records).encode()
+        encodings['columns, orjson'] = lambda: fast_json.dumps(columns).encode()
+    if encoders.msgpack is not None:
+        encodings['columns, msgpack'] = lambda: encoders.encode_msgpack(columns)
+    if encoders.pa is not None:
+        encodings['columns, arrow'] = lambda: encoders.encode_arrow(encoders.arrow_table(columns))
+
+    print(f'{rows} daily bars')
+    for name, encode in encodings.items():
+        seconds, body = timed(encode, repeat=5)
+        print(f'{name:>22}: {seconds * 1000:7.2f}ms {len(body) / 1024:8.1f} KiB')
+
+
+def bench_profiles(count=100_000, lookups=50, picture_bytes=2048, seed=42):
+    """Profile lookups as the routes used to do them versus the repository.
+
+    Runs against MONGO_BENCH_URI when set (a scratch database is created and
+    dropped), otherwise against an in-process mongomock collection. mongomock
+    scans the collection on every query, so only the mongod run shows what
+    the index saves; both show the smaller documents a projection returns.
+    """
+    import bson
+
+    from db_operations import STOCKS_FIELDS, ProfileRepository
+
+    uri = os.getenv('MONGO_BENCH_URI')
+    if uri:
+        from pymongo import MongoClient
+        client = MongoClient(uri)
+        client.drop_database('stocksense_bench')
+        collection = client['stocksense_bench']['Profiles']
+    else:
+        import mongomock
+        collection = mongomock.MongoClient()['stocksense_bench']['Profiles']
+
+    rng = np.random.default_rng(seed)
+    picture = 'data:image/png;base64,' + 'A' * picture_bytes
+    profiles = [
+        {
+            'firstName': f'user{i}',
+            'email': f'user{i}@example.com',
+            'password': f'secret{i}',
+            'profilePicture': picture,
+            'stocks': ['TCS', 'INFY', 'SUZLON'][:i % 4],
+        }
+        for i in range(count)
+    ]
+    collection.insert_many(profiles)
+    emails = [f'user{i}@example.com' for i in rng.integers(0, count, lookups)]
+    repository = ProfileRepository(collection)
+
+    def full_documents():
+        return [collection.find_one({'email': email}).get('stocks', []) for email in emails]
+
+    def projected():
+        return [repository.get_stocks(email) for email in emails]
+
+    backend = 'mongod' if uri else 'mongomock'
+    print(f'{count} profiles on {backend}, {lookups} stock lookups')
+    scan_time, expected = timed(full_documents, repeat=1)
+    print(f'no index, full document: {scan_time * 1000 / lookups:.2f}ms per lookup')
+    repository.ensure_indexes()
+    full_time, _ = timed(full_documents, repeat=1)
+    projected_time, result = timed(projected, repeat=1)
+    assert result == expected
+    print(f'indexed, full document:  {full_time * 1000 / lookups:.2f}ms per lookup')
+    print(f'indexed, projection:     {projected_time * 1000 / lookups:.2f}ms per lookup')
+    full_size = len(bson.encode(collection.find_one({'email': emails[0]})))
+    projected_size = len(bson.encode(collection.find_one({'email': emails[0]}, STOCKS_FIELDS)))
+    print(f'document size: {full_size} bytes full, {projected_size} bytes projected')
+    if uri:
+        client.drop_database('stocksense_bench')
+
+
+def bench_startup(module='app', top=10):
+    """Import cost of the app module from `python -X importtime`.
+
+    Exits with an error if any of app.HEAVY_MODULES is imported at startup,
+    so a stray top-level import shows up as a regression.
+    """
+    import subprocess
+    import sys
+
+    backend = os.path.dirname(os.path.abspath(__file__))
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                               cwd=backend, capture_output=True, text=True, check=True)
+    timings = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        timings[name.strip()] = (int(self_us), int(cumulative_us))
+    total = timings[module][1]
+    print(f'import {module}: {total / 1000:.0f}ms, {len(timings)} modules')
+    print('largest top-level packages:')
+    packages = {name: cumulative for name, (_, cumulative) in timings.items() if '.' not in name}
+    for name, cumulative in sorted(packages.items(), key=lambda item: -item[1])[:top]:
+        print(f'  {name:<24} {cumulative / 1000:8.1f}ms')
+
+    from app import HEAVY_MODULES
+    eager = [name for name in HEAVY_MODULES if name in timings]
+    if eager:
+        raise SystemExit(f"imported at startup but should be deferred: {', '.join(eager)}")
+
+
+def chart_payload(data, gmtoffset=19800):
+    """A Yahoo chart API response for `data`, with bars stamped at the 09:15 IST open."""
+    open_seconds = 9 * 3600 + 15 * 60 - gmtoffset
+    return {'chart': {'error': None, 'result': [{
+        'meta': {'gmtoffset': gmtoffset},
+        'timestamp': [int(day.timestamp()) + open_seconds for day in data.index],
+        'indicators': {'quote': [{column.lower(): data[column].tolist() for column in data.columns}]},
+    }]}}
+
+
+class ReplayServer:
+    """Local HTTP stub serving recorded JSON responses by path, with a fixed latency.
+
+    `responses` maps a request path (without the query string) to the payload
+    to return, e.g. chart responses saved from Yahoo; other paths get a 404.
+    """
+
+    def __init__(self, responses, latency=0.05):
+        import json
+        import threading
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        bodies = {path: json.dumps(payload).encode() for path, payload in responses.items()}
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                super().setup()
+                self.server.connections += 1
+
+            def do_GET(self):
+                time.sleep(latency)
+                body = bodies.get(self.path.split('?')[0])
+                self.send_response(200 if body is not None else 404)
+                body = body if body is not None else b'{}'
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.server.connections = 0
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    @property
+    def connections(self):
+        """TCP connections accepted so far."""
+        return self.server.connections
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def bench_fetch(symbols=40, rows=1500, latency=0.05):
+    """Price downloads against a local stub: one connection per call vs the pooled concurrent client."""
+    import requests
+
+    from price_store import YahooChartFetcher, chart_to_ohlcv
+
+    fixtures = {f'SYM{i}.NS': make_fixture_ohlcv(rows, seed=i) for i in range(symbols)}
+    server = ReplayServer({f'/chart/{symbol}': chart_payload(data) for symbol, data in fixtures.items()}, latency)
+    try:
+        def sequential():
+            return {symbol: chart_to_ohlcv(requests.get(f'{server.url}/chart/{symbol}', params={'interval': '1d'},
+                                                        timeout=10).json())
+                    for symbol in fixtures}
+
+        fetcher = YahooChartFetcher(url=server.url + '/chart/{symbol}')
+        connections = server.connections
+        sequential_time, expected = timed(sequential, repeat=1)
+        sequential_connections = server.connections - connections
+        connections = server.connections
+        pooled_time, frames = timed(fetcher.fetch_many, list(fixtures), repeat=1)
+        pooled_connections = server.connections - connections
+    finally:
+        server.close()
+
+    for symbol, data in fixtures.items():
+        pd.testing.assert_frame_equal(frames[symbol], expected[symbol])
+        np.testing.assert_allclose(frames[symbol].to_numpy(), data.to_numpy())
+    print(f'{symbols} symbols, {latency * 1000:.0f}ms stub latency')
+    print(f'sequential requests.get: {sequential_time:.3f}s, {sequential_connections} connections')
+    print(f'pooled client:           {pooled_time:.3f}s, {pooled_connections} connections')
+    print(f'speedup: {sequential_time / pooled_time:.1f}x')
+
+
+BENCHMARKS = {
+    'short_term': bench_short_term,
+    'indicators': bench_indicators,
+    'streaming': bench_streaming,
+    'matcher': bench_matcher,
+    'serialization': bench_serialization,
+    'profiles': bench_profiles,
+    'startup': bench_startup,
+    'fetch': bench_fetch,
+}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('benchmark', choices=sorted(BENCHMARKS))
+    args = parser.parse_args()
+    BENCHMARKS[args.benchmark]()
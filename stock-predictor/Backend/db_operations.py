@@ -1,9 +1,128 @@
-from pymongo import MongoClient
+import logging
+import os
+
+from pymongo import MongoClient, UpdateOne
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+from metrics import timed
+
+logger = logging.getLogger(__name__)
+
+MONGO_URI = os.getenv('MONGO_URI', 'mongodb://localhost:27017/')
+MONGO_DB = os.getenv('MONGO_DB', 'StockSense')
+MONGO_MAX_POOL_SIZE = int(os.getenv('MONGO_MAX_POOL_SIZE', 50))
+MONGO_MIN_POOL_SIZE = int(os.getenv('MONGO_MIN_POOL_SIZE', 0))
+MONGO_TIMEOUT_MS = int(os.getenv('MONGO_TIMEOUT_MS', 5000))
+
+def _connect():
+    return MongoClient(
+        MONGO_URI,
+        maxPoolSize=MONGO_MAX_POOL_SIZE,
+        minPoolSize=MONGO_MIN_POOL_SIZE,
+        serverSelectionTimeoutMS=MONGO_TIMEOUT_MS
+    )
+
+
+client = _connect()
+db = client[MONGO_DB]
+collection = db['Profiles']
+
+# Fields each route needs; everything else (e.g. the profile picture) stays on the server
+LOGIN_FIELDS = {'_id': 0, 'email': 1, 'password': 1, 'firstName': 1, 'profilePicture': 1}
+STOCKS_FIELDS = {'_id': 0, 'stocks': 1}
+
+
+class ProfileRepository:
+    """Queries on the Profiles collection, each fetching only the fields it uses."""
+
+    def __init__(self, collection):
+        self.collection = collection
+        # Whether the unique email index is known to be in place
+        self.unique_emails = False
+
+    def ensure_indexes(self):
+        self.collection.create_index('email', unique=True, name='email_unique')
+        self.unique_emails = True
+
+    @timed('mongo.exists')
+    def exists(self, email):
+        return self.collection.find_one({'email': email}, {'_id': 1}) is not None
+
+    @timed('mongo.create')
+    def create(self, profile):
+        """Insert a new profile; returns False if the email is already registered."""
+        if not self.unique_emails and self.exists(profile.get('email')):
+            # Without the index nothing else stops a second registration
+            return False
+        try:
+            return self.collection.insert_one(profile).acknowledged
+        except DuplicateKeyError:
+            return False
+
+    @timed('mongo.get_login')
+    def get_login(self, email):
+        return self.collection.find_one({'email': email}, LOGIN_FIELDS)
+
+    @timed('mongo.get_stocks')
+    def get_stocks(self, email):
+        """The user's stock symbols, or None if there is no such user."""
+        user = self.collection.find_one({'email': email}, STOCKS_FIELDS)
+        if user is None:
+            return None
+        return user.get('stocks', [])
+
+    @timed('mongo.add_stock')
+    def add_stock(self, email, stock_symbol):
+        """Add a symbol in one atomic update.
+
+        `matched_count` is 0 if the user does not exist and `modified_count`
+        is 0 if the symbol was already in the portfolio.
+        """
+        return self.collection.update_one({'email': email}, {'$addToSet': {'stocks': stock_symbol}})
+
+    @timed('mongo.remove_stock')
+    def remove_stock(self, email, stock_symbol):
+        """Remove a symbol in one atomic update; matches only if the user holds it."""
+        return self.collection.update_one({'email': email, 'stocks': stock_symbol}, {'$pull': {'stocks': stock_symbol}})
+
+    @timed('mongo.update_stocks')
+    def update_stocks(self, email, add=(), remove=()):
+        """Apply many additions and removals in one ordered bulk write.
+
+        Each operation only matches when it would change the portfolio, so
+        the result's `modified_count` is the number of symbols changed.
+        """
+        operations = [
+            UpdateOne({'email': email, 'stocks': {'$ne': symbol}}, {'$push': {'stocks': symbol}})
+            for symbol in add
+        ]
+        operations += [
+            UpdateOne({'email': email, 'stocks': symbol}, {'$pull': {'stocks': symbol}})
+            for symbol in remove
+        ]
+        if not operations:
+            return None
+        return self.collection.bulk_write(operations, ordered=True)
+
+
+profiles = ProfileRepository(collection)
 
-client = MongoClient('mongodb://localhost:27017/')
-db = client['StockSense']  # Replace with your database name
-collection = db['Profiles']  # Replace with your collection name
 
 def initialize_db(app):
-    # Any additional initialization can go here if needed
-    pass
+    """Create the indexes the routes rely on."""
+    try:
+        profiles.ensure_indexes()
+    except PyMongoError as e:
+        # Existing duplicate emails block the unique index and an unreachable
+        # server any index; the app still starts and checks emails itself
+        logger.error(f'Could not create the unique email index: {e}')
+    app.extensions['profiles'] = profiles
+
+
+def reconnect():
+    """Open a new client, e.g. in a worker forked from a process that already used the old one."""
+    global client, db, collection
+    client = _connect()
+    db = client[MONGO_DB]
+    collection = db['Profiles']
+    profiles.collection = collection
@@ -0,0 +1,151 @@
+"""Response encoding for NumPy/pandas values with optional fast and binary formats.
+
+`FastJSONProvider` replaces Flask's JSON provider. It converts ndarrays,
+Series, DataFrames, NumPy scalars and datetimes itself, uses orjson when it
+is installed, and answers with MessagePack or Arrow IPC instead of JSON when
+the client asks for them in its Accept header and the library is available.
+"""
+import json
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+from flask import has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+JSON_MIMETYPE = 'application/json'
+MSGPACK_MIMETYPE = 'application/msgpack'
+ARROW_MIMETYPE = 'application/vnd.apache.arrow.stream'
+
+if orjson is not None:
+    ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def to_builtin(o):
+    """Convert NumPy/pandas/datetime values into JSON-compatible builtins.
+
+    Dates are ISO 8601 strings. Everything else goes to Flask's default
+    encoder (Decimal, UUID, dataclasses, `__html__` objects).
+    """
+    if isinstance(o, np.generic):
+        return o.item()
+    if isinstance(o, np.ndarray):
+        return o.tolist()
+    if isinstance(o, pd.DataFrame):
+        # Column-oriented, like the stock history payload
+        return {str(column): to_builtin(o[column]) for column in o.columns}
+    if isinstance(o, (pd.Series, pd.Index)):
+        if pd.api.types.is_datetime64_any_dtype(o.dtype):
+            return [value.isoformat() if value is not pd.NaT else None for value in o]
+        return o.tolist()
+    if isinstance(o, (datetime, date)):
+        return o.isoformat()
+    if isinstance(o, (set, frozenset)):
+        return list(o)
+    return DefaultJSONProvider.default(o)
+
+
+def _columns(obj):
+    """The value as `{column: list}` if it is a table of equal-length columns, else None."""
+    if isinstance(obj, pd.DataFrame):
+        return to_builtin(obj)
+    if isinstance(obj, dict) and obj and all(isinstance(v, (list, np.ndarray, pd.Series, pd.Index)) for v in obj.values()):
+        if len({len(v) for v in obj.values()}) == 1:
+            return {str(k): to_builtin(v) if not isinstance(v, list) else v for k, v in obj.items()}
+    return None
+
+
+def arrow_table(obj):
+    """Build an Arrow table from a tabular payload, or return None.
+
+    A dict with exactly one tabular member (e.g. `stock_history`) becomes
+    that table, with the remaining keys stored as JSON in the schema
+    metadata.
+    """
+    columns = _columns(obj)
+    if columns is not None:
+        return pa.Table.from_pydict(columns)
+    if not isinstance(obj, dict):
+        return None
+    tables = {key: _columns(value) for key, value in obj.items()}
+    tables = {key: value for key, value in tables.items() if value is not None}
+    if len(tables) != 1:
+        return None
+    (name, columns), = tables.items()
+    metadata = {'table': name}
+    metadata.update({key: json.dumps(value, default=to_builtin) for key, value in obj.items() if key != name})
+    return pa.Table.from_pydict(columns, metadata=metadata)
+
+
+def encode_arrow(table):
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def encode_msgpack(obj):
+    return msgpack.packb(obj, default=to_builtin, use_bin_type=True)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    default = staticmethod(to_builtin)
+
+    def dumps(self, obj, **kwargs):
+        if orjson is not None:
+            options = ORJSON_OPTIONS
+            if kwargs.get('indent'):
+                options |= orjson.OPT_INDENT_2
+            if kwargs.get('sort_keys', self.sort_keys):
+                options |= orjson.OPT_SORT_KEYS
+            return orjson.dumps(obj, default=to_builtin, option=options).decode()
+        return super().dumps(obj, **kwargs)
+
+    def response(self, *args, **kwargs):
+        mimetype = negotiate()
+        if mimetype != JSON_MIMETYPE:
+            obj = self._prepare_response_obj(args, kwargs)
+            if mimetype == MSGPACK_MIMETYPE:
+                body = encode_msgpack(obj)
+            else:
+                table = arrow_table(obj)
+                body = encode_arrow(table) if table is not None else None
+            if body is not None:
+                response = self._app.response_class(body, mimetype=mimetype)
+                response.vary.add('Accept')
+                return response
+        response = super().response(*args, **kwargs)
+        if msgpack is not None or pa is not None:
+            response.vary.add('Accept')
+        return response
+
+
+def available_mimetypes():
+    mimetypes = [JSON_MIMETYPE]
+    if msgpack is not None:
+        mimetypes.append(MSGPACK_MIMETYPE)
+    if pa is not None:
+        mimetypes.append(ARROW_MIMETYPE)
+    return mimetypes
+
+
+def negotiate():
+    """Best response format for the current request's Accept header."""
+    if not has_request_context():
+        return JSON_MIMETYPE
+    return request.accept_mimetypes.best_match(available_mimetypes(), default=JSON_MIMETYPE)
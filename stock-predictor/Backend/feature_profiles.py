@@ -0,0 +1,177 @@
+"""Named feature sets for the short-term model and an offline pruning job.
+
+A profile is a list of indicator columns. `default` is the 16-column set the
+model has been using and `full` is every indicator the engine can compute.
+Further profiles are JSON files in FEATURE_PROFILE_DIR, usually written by
+
+    python feature_profiles.py prune --synthetic 4 --name pruned
+    FEATURE_PROFILE=pruned python app.py
+
+which ranks the full set by forest importance and drops columns that are
+almost perfectly correlated with a more important one.
+"""
+import argparse
+import json
+import logging
+import os
+from datetime import datetime
+
+from atomic_files import atomic_write
+from indicators import FIBONACCI_COLUMNS, INDICATORS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROFILE_DIR = os.getenv(
+    'FEATURE_PROFILE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'feature_profiles')
+)
+FEATURE_PROFILE = os.getenv('FEATURE_PROFILE', 'default')
+
+BUILTIN_PROFILES = {
+    'default': ['SMA_30', 'SMA_100', 'EMA_20', 'EMA_50',
+                'RSI', 'MACD', 'MACD Signal', 'MACD Histogram',
+                'Bollinger High', 'Bollinger Low', 'ATR',
+                'Stochastic Oscillator', 'OBV', 'CMF',
+                'Aroon Up', 'Aroon Down'],
+    'full': [column for column in INDICATORS if column not in FIBONACCI_COLUMNS],
+}
+
+
+def _path(name, directory=DEFAULT_PROFILE_DIR):
+    return os.path.join(directory, f'{name}.json')
+
+
+def load_profile(name=None, directory=DEFAULT_PROFILE_DIR):
+    """Columns of the named profile (FEATURE_PROFILE by default)."""
+    name = name or FEATURE_PROFILE
+    if name in BUILTIN_PROFILES:
+        return list(BUILTIN_PROFILES[name])
+    path = _path(name, directory)
+    if not os.path.exists(path):
+        raise ValueError(f'Unknown feature profile: {name}')
+    with open(path) as f:
+        columns = json.load(f)['columns']
+    unknown = [column for column in columns if column not in INDICATORS]
+    if unknown:
+        raise ValueError(f"Feature profile {name} uses unknown columns: {', '.join(unknown)}")
+    return columns
+
+
+def list_profiles(directory=DEFAULT_PROFILE_DIR):
+    names = set(BUILTIN_PROFILES)
+    if os.path.isdir(directory):
+        names.update(name[:-5] for name in os.listdir(directory) if name.endswith('.json'))
+    return sorted(names)
+
+
+def save_profile(name, columns, details=None, directory=DEFAULT_PROFILE_DIR):
+    if name in BUILTIN_PROFILES:
+        raise ValueError(f'Cannot overwrite the built-in profile {name}')
+    os.makedirs(directory, exist_ok=True)
+    profile = {'name': name, 'columns': list(columns), 'created': datetime.now().isoformat(timespec='seconds')}
+    profile.update(details or {})
+    with atomic_write(_path(name, directory)) as f:
+        json.dump(profile, f, indent=2)
+    return _path(name, directory)
+
+
+def prune_features(histories, candidates=None, correlation_threshold=0.95, importance_coverage=0.99,
+                   max_features=None, n_estimators=100, seed=42):
+    """Select a feature subset from several symbols' OHLCV histories.
+
+    Columns are ranked by the impurity importance of a forest trained on all
+    candidates. Walking down that ranking, a column is dropped if its absolute
+    correlation with an already kept column exceeds `correlation_threshold`
+    (its importance then counts towards that column). Selection stops once
+    `importance_coverage` of the total importance is covered or
+    `max_features` columns are kept.
+    """
+    import pandas as pd
+    from sklearn.ensemble import RandomForestRegressor
+
+    from indicators import compute_indicators
+    from stock_analysis import PRICE_TARGETS
+
+    candidates = candidates or BUILTIN_PROFILES['full']
+    frames = []
+    for data in histories:
+        features = compute_indicators(data, candidates)
+        frames.append(pd.concat([features, data[PRICE_TARGETS]], axis=1).dropna())
+    frame = pd.concat(frames)
+    X, y = frame[candidates], frame[PRICE_TARGETS]
+
+    model = RandomForestRegressor(n_estimators=n_estimators, random_state=seed, n_jobs=-1)
+    model.fit(X, y)
+    importances = pd.Series(model.feature_importances_, index=candidates).sort_values(ascending=False)
+    correlations = X.corr().abs()
+
+    kept, dropped, covered = [], {}, 0.0
+    for column in importances.index:
+        # A dropped column's importance counts as covered by its kept twin
+        covered += importances[column]
+        twin = next((other for other in kept if correlations.at[column, other] > correlation_threshold), None)
+        if twin is not None:
+            dropped[column] = twin
+            continue
+        kept.append(column)
+        if covered >= importance_coverage * importances.sum() or (max_features and len(kept) >= max_features):
+            break
+    details = {
+        'importances': {column: float(value) for column, value in importances.items()},
+        'correlated_with': dropped,
+        'correlation_threshold': correlation_threshold,
+        'importance_coverage': importance_coverage,
+        'rows': int(len(frame)),
+        'symbols': len(frames),
+    }
+    # Keep the engine's column order so profiles diff cleanly
+    return [column for column in candidates if column in kept], details
+
+
+def _load_histories(args):
+    if args.synthetic:
+        from benchmarks import make_fixture_ohlcv
+        return [make_fixture_ohlcv(args.rows, seed=i) for i in range(args.synthetic)]
+    from price_store import CsvFixtureFetcher
+    fetcher = CsvFixtureFetcher(args.fixtures)
+    symbols = args.symbols or sorted(name[:-4] for name in os.listdir(args.fixtures) if name.endswith('.csv'))
+    return [data for data in (fetcher.fetch(symbol) for symbol in symbols) if not data.empty]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('list', help='show the available profiles')
+    show = commands.add_parser('show', help='print the columns of a profile')
+    show.add_argument('name')
+    prune = commands.add_parser('prune', help='write a pruned profile')
+    source = prune.add_mutually_exclusive_group(required=True)
+    source.add_argument('--fixtures', help='directory of <SYMBOL>.csv OHLCV files')
+    source.add_argument('--synthetic', type=int, help='number of seeded random-walk symbols')
+    prune.add_argument('--symbols', nargs='*')
+    prune.add_argument('--rows', type=int, default=1500)
+    prune.add_argument('--name', default='pruned')
+    prune.add_argument('--correlation', type=float, default=0.95)
+    prune.add_argument('--coverage', type=float, default=0.99)
+    prune.add_argument('--max-features', type=int)
+    args = parser.parse_args()
+
+    if args.command == 'list':
+        for name in list_profiles():
+            print(f'{name}: {len(load_profile(name))} columns')
+    elif args.command == 'show':
+        print('\n'.join(load_profile(args.name)))
+    else:
+        histories = _load_histories(args)
+        if not histories:
+            parser.error('no price history found')
+        columns, details = prune_features(histories, correlation_threshold=args.correlation,
+                                          importance_coverage=args.coverage, max_features=args.max_features)
+        path = save_profile(args.name, columns, details)
+        print(f"Kept {len(columns)} of {len(details['importances'])} columns -> {path}")
+        for column in columns:
+            print(f"  {column:<28} {details['importances'][column]:.4f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+"""Production server settings, read by `gunicorn wsgi:app` from this directory.
+
+With preload_app the master builds the app once (database indexes, company
+mappings and the model libraries) and forks the workers afterwards, so they
+share that memory copy-on-write. Quotes and predictions go through a SQLite
+cache shared by all workers instead of being warmed separately by each one.
+The same cache lets any worker answer for a prediction job submitted to
+another, and one worker at a time fetches the news for all of them.
+
+    WEB_WORKERS=4 WEB_THREADS=8 gunicorn wsgi:app
+"""
+import multiprocessing
+import os
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+bind = os.getenv('WEB_BIND', f"0.0.0.0:{os.getenv('PORT', 5000)}")
+workers = int(os.getenv('WEB_WORKERS', multiprocessing.cpu_count()))
+# Threads per worker; requests mostly wait on Mongo, Yahoo or the model pool
+worker_class = 'gthread'
+threads = int(os.getenv('WEB_THREADS', 4))
+timeout = int(os.getenv('WEB_TIMEOUT', 120))
+graceful_timeout = int(os.getenv('WEB_GRACEFUL_TIMEOUT', 30))
+preload_app = os.getenv('WEB_PRELOAD', 'True').lower() in ['true', '1', 't']
+accesslog = '-'
+
+# Read by the app when wsgi.py is imported, which happens after this file
+os.environ.setdefault('SHARED_CACHE_PATH', os.path.join(BACKEND_DIR, 'data', 'shared_cache.sqlite3'))
+os.environ.setdefault('PRELOAD_HEAVY_IMPORTS', str(preload_app))
+os.environ.setdefault('START_BACKGROUND_TASKS', str(not preload_app))
+# Every worker has its own model process pool; split the cores between them
+os.environ.setdefault('PREDICT_WORKERS', str(max(1, multiprocessing.cpu_count() // workers)))
+
+
+def post_fork(server, worker):
+    if not preload_app:
+        return
+    from app import start_background_tasks
+    from db_operations import reconnect
+
+    # The master's Mongo client and threads are not usable after the fork
+    reconnect()
+    start_background_tasks()
@@ -0,0 +1,172 @@
+"""Pooled HTTP client for the external data sources (Yahoo prices, the news feed).
+
+Every process keeps one client instead of opening a connection per call.
+With aiohttp installed, requests run on an event loop in a background thread
+and share one connection pool with keep-alive, a per-host concurrency limit
+and timeouts; `get_json_many` sends a whole batch concurrently. Without
+aiohttp, a pooled requests.Session and a thread pool provide the same
+interface.
+"""
+import asyncio
+import atexit
+import contextvars
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import aiohttp
+except ImportError:  # Optional: the requests fallback is used instead
+    aiohttp = None
+
+logger = logging.getLogger(__name__)
+
+HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', 64))
+HTTP_PER_HOST_LIMIT = int(os.getenv('HTTP_PER_HOST_LIMIT', 8))
+HTTP_TIMEOUT = float(os.getenv('HTTP_TIMEOUT', 10))
+HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', 3))
+HTTP_KEEPALIVE = float(os.getenv('HTTP_KEEPALIVE', 30))
+HTTP_USER_AGENT = os.getenv('HTTP_USER_AGENT', 'Mozilla/5.0 (compatible; StockSense)')
+
+
+class FetchError(Exception):
+    """A request failed, timed out or returned an error status."""
+
+
+class AsyncHTTPClient:
+    """aiohttp session on a private event loop, callable from synchronous code."""
+
+    def __init__(self, pool_size=HTTP_POOL_SIZE, per_host=HTTP_PER_HOST_LIMIT, timeout=HTTP_TIMEOUT,
+                 connect_timeout=HTTP_CONNECT_TIMEOUT, keepalive=HTTP_KEEPALIVE):
+        self.pool_size = pool_size
+        self.per_host = per_host
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.keepalive = keepalive
+        self._session = None
+        self._pid = os.getpid()
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='http-client', daemon=True)
+        self._thread.start()
+
+    def _get_session(self):
+        # Created on the loop that uses it
+        if self._session is None:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, limit_per_host=self.per_host,
+                                             keepalive_timeout=self.keepalive, ttl_dns_cache=300)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout, sock_connect=self.connect_timeout),
+                headers={'User-Agent': HTTP_USER_AGENT},
+            )
+        return self._session
+
+    async def fetch_json(self, url, params=None, headers=None, timeout=None):
+        kwargs = {'params': params, 'headers': headers}
+        if timeout is not None:
+            kwargs['timeout'] = aiohttp.ClientTimeout(total=timeout, sock_connect=self.connect_timeout)
+        try:
+            async with self._get_session().get(url, **kwargs) as response:
+                response.raise_for_status()
+                return await response.json(content_type=None)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            raise FetchError(f'GET {url} failed: {e!r}') from e
+
+    def _run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    def get_json(self, url, params=None, headers=None, timeout=None):
+        return self._run(self.fetch_json(url, params, headers, timeout))
+
+    def get_json_many(self, requests, headers=None):
+        """Fetch `[(url, params), ...]` concurrently; failed entries are FetchError instances."""
+        async def gather():
+            return await asyncio.gather(
+                *(self.fetch_json(url, params, headers) for url, params in requests), return_exceptions=True
+            )
+        return self._run(gather())
+
+    def close(self):
+        # A forked child inherits the loop but not the thread running it
+        if self._pid != os.getpid() or self._loop.is_closed():
+            return
+        if self._session is not None:
+            self._run(self._session.close())
+            self._session = None
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+
+class SessionHTTPClient:
+    """The same interface on a pooled requests.Session and a thread pool."""
+
+    def __init__(self, pool_size=HTTP_POOL_SIZE, per_host=HTTP_PER_HOST_LIMIT, timeout=HTTP_TIMEOUT,
+                 connect_timeout=HTTP_CONNECT_TIMEOUT):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self._errors = (requests.RequestException, ValueError)
+        self._session = requests.Session()
+        self._session.headers['User-Agent'] = HTTP_USER_AGENT
+        adapter = HTTPAdapter(pool_connections=max(1, pool_size // per_host), pool_maxsize=per_host, pool_block=True)
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
+        self._pool = ThreadPoolExecutor(max_workers=per_host, thread_name_prefix='http')
+
+    def get_json(self, url, params=None, headers=None, timeout=None):
+        try:
+            response = self._session.get(url, params=params, headers=headers,
+                                         timeout=(self.connect_timeout, timeout or self.timeout))
+            response.raise_for_status()
+            return response.json()
+        except self._errors as e:
+            raise FetchError(f'GET {url} failed: {e!r}') from e
+
+    def get_json_many(self, requests, headers=None):
+        """Fetch `[(url, params), ...]` concurrently; failed entries are FetchError instances."""
+        futures = [self._pool.submit(self.get_json, url, params, headers) for url, params in requests]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except FetchError as e:
+                results.append(e)
+        return results
+
+    def close(self):
+        self._pool.shutdown(wait=False)
+        self._session.close()
+
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+
+def get_http_client():
+    """The process's shared client; a forked worker gets its own."""
+    global _client, _client_pid
+    with _client_lock:
+        if _client is None or _client_pid != os.getpid():
+            _client = AsyncHTTPClient() if aiohttp is not None else SessionHTTPClient()
+            _client_pid = os.getpid()
+            atexit.register(_client.close)
+        return _client
+
+
+def concurrently(*calls):
+    """Run independent blocking calls at the same time and return their results in order.
+
+    The first call runs in the calling thread. The others keep the caller's
+    context, so their spans still show up in an X-Profile breakdown.
+    """
+    if len(calls) < 2:
+        return [call() for call in calls]
+    with ThreadPoolExecutor(max_workers=len(calls) - 1) as pool:
+        futures = [pool.submit(contextvars.copy_context().run, call) for call in calls[1:]]
+        first = calls[0]()
+        return [first] + [future.result() for future in futures]
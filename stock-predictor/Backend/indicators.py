@@ -0,0 +1,340 @@
+"""Vectorized technical indicators for the prediction features.
+
+Produces the same values as the `ta` calls the models were built on, but
+shares intermediate results (EMAs, true range, rolling highs and lows)
+between indicators and returns every requested column in one contiguous
+float block instead of assigning Series into the frame one at a time.
+"""
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+FIBONACCI_COLUMNS = ['Fibonacci Level 0.0', 'Fibonacci Level 0.236', 'Fibonacci Level 0.382',
+                     'Fibonacci Level 0.618', 'Fibonacci Level 1.0']
+
+
+def _ewm(values, alpha, min_periods):
+    """pandas `ewm(alpha=..., adjust=False).mean()`, skipping leading NaNs."""
+    out = np.full(len(values), np.nan)
+    valid = np.flatnonzero(~np.isnan(values))
+    if len(valid) == 0:
+        return out
+    start = valid[0]
+    x = values[start:]
+    from scipy.signal import lfilter
+    out[start:] = lfilter([alpha], [1, alpha - 1], x, zi=[(1 - alpha) * x[0]])[0]
+    out[start:start + min_periods - 1] = np.nan
+    return out
+
+
+def _ema(values, span):
+    return _ewm(values, 2 / (span + 1), span)
+
+
+def _wilder(first, values, window):
+    """Continue `s[i] = s[i-1] * (1 - 1/window) + values[i]` from `first`."""
+    decay = 1 - 1 / window
+    from scipy.signal import lfilter
+    return lfilter([1], [1, -decay], values, zi=[decay * first])[0]
+
+
+def _rolling(values, window, func, min_periods=None):
+    out = np.full(len(values), np.nan)
+    if len(values) >= window:
+        out[window - 1:] = func(sliding_window_view(values, window), axis=-1)
+    if min_periods is not None and min_periods < window:
+        # Expanding window until the first full one, as pandas does
+        for i in range(min_periods - 1, min(window - 1, len(values))):
+            out[i] = func(values[:i + 1])
+    return out
+
+
+def _shift(values, periods=1, fill_value=np.nan):
+    out = np.full(len(values), fill_value, dtype=float)
+    out[periods:] = values[:-periods]
+    return out
+
+
+def _divide(numerator, denominator):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return numerator / denominator
+
+
+class _Primitives:
+    """Lazily computed building blocks shared by several indicators."""
+
+    def __init__(self, data):
+        self.open = data['Open'].to_numpy(dtype=float)
+        self.high = data['High'].to_numpy(dtype=float)
+        self.low = data['Low'].to_numpy(dtype=float)
+        self.close = data['Close'].to_numpy(dtype=float)
+        self.volume = data['Volume'].to_numpy(dtype=float)
+        self._cache = {}
+
+    def _memo(self, key, compute):
+        if key not in self._cache:
+            self._cache[key] = compute()
+        return self._cache[key]
+
+    def ema(self, span):
+        return self._memo(('ema', span), lambda: _ema(self.close, span))
+
+    def sma(self, window):
+        return self._memo(('sma', window), lambda: _rolling(self.close, window, np.mean))
+
+    def prev_close(self):
+        return self._memo('prev_close', lambda: _shift(self.close))
+
+    def true_range(self):
+        # The first bar has no previous close, so its range is just high - low
+        def compute():
+            prev_close = self.prev_close()
+            ranges = np.vstack([self.high - self.low, np.abs(self.high - prev_close), np.abs(self.low - prev_close)])
+            return np.nanmax(ranges, axis=0)
+        return self._memo('true_range', compute)
+
+    def highest_high(self, window):
+        return self._memo(('highest_high', window), lambda: _rolling(self.high, window, np.max))
+
+    def lowest_low(self, window):
+        return self._memo(('lowest_low', window), lambda: _rolling(self.low, window, np.min))
+
+    def typical_price(self):
+        return self._memo('typical_price', lambda: (self.high + self.low + self.close) / 3.0)
+
+    def rsi(self, window=14):
+        def compute():
+            diff = np.diff(self.close, prepend=np.nan)
+            up = np.where(diff > 0, diff, 0.0)
+            down = np.where(diff < 0, -diff, 0.0)
+            ema_up = _ewm(up, 1 / window, window)
+            ema_down = _ewm(down, 1 / window, window)
+            return np.where(ema_down == 0, 100, 100 - 100 / (1 + _divide(ema_up, ema_down)))
+        return self._memo(('rsi', window), compute)
+
+    def macd(self):
+        return self._memo('macd', lambda: self.ema(12) - self.ema(26))
+
+    def macd_signal(self):
+        return self._memo('macd_signal', lambda: _ema(self.macd(), 9))
+
+    def bollinger_std(self, window=20):
+        return self._memo(('bollinger_std', window), lambda: _rolling(self.close, window, np.std))
+
+    def atr(self, window=14):
+        def compute():
+            tr = self.true_range()
+            atr = np.zeros(len(tr))
+            if len(tr) >= window:
+                atr[window - 1] = tr[:window].mean()
+                atr[window:] = _wilder(atr[window - 1], tr[window:] / window, window)
+            return atr
+        return self._memo(('atr', window), compute)
+
+    def directional_movement(self, window=14):
+        """Smoothed true range and +DM/-DM sums, laid out like ta's ADXIndicator.
+
+        None when there are not enough bars for the first sum.
+        """
+        def compute():
+            n = len(self.close)
+            if n <= window:
+                return None
+            size = n - (window - 1)
+            tr = self.true_range()
+            diff_up = self.high - _shift(self.high)
+            diff_down = _shift(self.low) - self.low
+            pos = np.where((diff_up > diff_down) & (diff_up > 0), diff_up, 0.0)
+            neg = np.where((diff_down > diff_up) & (diff_down > 0), diff_down, 0.0)
+            smoothed = []
+            for series in (tr, pos, neg):
+                out = np.zeros(size)
+                out[0] = series[1:window + 1].sum()
+                if size > 2:
+                    out[1:size - 1] = _wilder(out[0], series[window + 1:window + size - 1], window)
+                smoothed.append(out)
+            return smoothed
+        return self._memo(('directional_movement', window), compute)
+
+
+def _adx(p, window=14):
+    if p.directional_movement(window) is None:
+        return np.full(len(p.close), np.nan)
+    trs, dip_sum, din_sum = p.directional_movement(window)
+    dip = np.where(trs != 0, 100 * _divide(dip_sum, trs), 0)
+    din = np.where(trs != 0, 100 * _divide(din_sum, trs), 0)
+    total = dip + din
+    dx = np.where(total != 0, 100 * np.abs(_divide(dip - din, total)), 0)
+    adx = np.zeros(len(trs))
+    if len(trs) > window:
+        adx[window] = dx[:window].mean()
+        adx[window + 1:] = _wilder(adx[window], dx[window:-1] / window, window)
+    return np.concatenate([np.zeros(window - 1), adx])
+
+
+def _directional_index(p, which, window=14):
+    if p.directional_movement(window) is None:
+        return np.zeros(len(p.close))  # As ta fills the bars before its first value
+    trs, dip_sum, din_sum = p.directional_movement(window)
+    sums = dip_sum if which == 'pos' else din_sum
+    out = np.zeros(len(p.close))
+    inner = slice(1, len(trs) - 1)
+    out[window + 1:window + len(trs) - 1] = np.where(trs[inner] != 0, 100 * _divide(sums[inner], trs[inner]), 0)
+    return out
+
+
+def _aroon(values, window, func):
+    out = np.full(len(values), np.nan)
+    if len(values) > window:
+        out[window:] = func(sliding_window_view(values, window + 1), axis=-1) / window * 100
+    return out
+
+
+def _mfi(p, window=14):
+    tp = p.typical_price()
+    prev_tp = _shift(tp)
+    direction = np.where(tp > prev_tp, 1, np.where(tp < prev_tp, -1, 0))
+    flow = tp * p.volume * direction
+    positive = _rolling(np.where(flow >= 0, flow, 0.0), window, np.sum)
+    negative = np.abs(_rolling(np.where(flow < 0, flow, 0.0), window, np.sum))
+    return 100 - 100 / (1 + _divide(positive, negative))
+
+
+def _cci(p, window=20, constant=0.015):
+    tp = p.typical_price()
+    mean = np.full(len(tp), np.nan)
+    mad = np.full(len(tp), np.nan)
+    if len(tp) >= window:
+        windows = sliding_window_view(tp, window)
+        mean[window - 1:] = windows.mean(axis=-1)
+        mad[window - 1:] = np.abs(windows - mean[window - 1:, None]).mean(axis=-1)
+    return _divide(tp - mean, constant * mad)
+
+
+def _stoch_rsi(p, window=14):
+    rsi = p.rsi(window)
+    lowest = _rolling(rsi, window, np.min)
+    return _divide(rsi - lowest, _rolling(rsi, window, np.max) - lowest)
+
+
+def _tsi(p, slow=25, fast=13):
+    diff = np.diff(p.close, prepend=np.nan)
+    smoothed = _ema(_ema(diff, slow), fast)
+    smoothed_abs = _ema(_ema(np.abs(diff), slow), fast)
+    return 100 * _divide(smoothed, smoothed_abs)
+
+
+def _dpo(p, window=20):
+    shifted = _shift(p.close, int(0.5 * window + 1), fill_value=p.close.mean())
+    return shifted - p.sma(window)
+
+
+def _vortex(p, which, window=14):
+    # ta fills the first previous close with the mean close for this indicator only
+    tr = p.true_range().copy()
+    if len(tr):
+        mean_close = p.close.mean()
+        tr[0] = max(p.high[0] - p.low[0], abs(p.high[0] - mean_close), abs(p.low[0] - mean_close))
+    trn = _rolling(tr, window, np.sum)
+    if which == 'pos':
+        movement = np.abs(p.high - _shift(p.low))
+    else:
+        movement = np.abs(p.low - _shift(p.high))
+    return _divide(_rolling(movement, window, np.sum), trn)
+
+
+def _trix(p, window=15):
+    ema3 = _ema(_ema(p.ema(window), window), window)
+    fill = np.nanmean(ema3) if np.any(~np.isnan(ema3)) else np.nan
+    prev = _shift(ema3, fill_value=fill)
+    return 100 * _divide(ema3 - prev, prev)
+
+
+def _ulcer_index(p, window=14):
+    running_max = _rolling(p.close, window, np.max, min_periods=1)
+    drawdown = 100 * (p.close - running_max) / running_max
+    return _rolling(drawdown, window, lambda x, axis=None: np.sqrt((x ** 2 / window).sum(axis=axis)))
+
+
+def _mass_index(p, fast=9, slow=25):
+    amplitude = p.high - p.low
+    ema1 = _ema(amplitude, fast)
+    ema2 = _ema(ema1, fast)
+    return _rolling(_divide(ema1, ema2), slow, np.sum)
+
+
+def _cmf(p, window=20):
+    hl = p.high - p.low
+    mfv = _divide((p.close - p.low) - (p.high - p.close), hl)
+    mfv = np.where(np.isnan(mfv), 0.0, mfv) * p.volume
+    return _divide(_rolling(mfv, window, np.sum), _rolling(p.volume, window, np.sum))
+
+
+def _obv(p):
+    return np.cumsum(np.where(p.close < p.prev_close(), -p.volume, p.volume))
+
+
+def _fibonacci(p, ratio):
+    high, low = p.close.max(), p.close.min()
+    return np.full(len(p.close), high - ratio * (high - low))
+
+
+INDICATORS = {
+    'SMA_30': lambda p: p.sma(30),
+    'SMA_100': lambda p: p.sma(100),
+    'EMA_20': lambda p: p.ema(20),
+    'EMA_50': lambda p: p.ema(50),
+    'EMA_100': lambda p: p.ema(100),
+    'EMA_200': lambda p: p.ema(200),
+    'RSI': lambda p: p.rsi(14),
+    'MFI': _mfi,
+    'MACD': lambda p: p.macd(),
+    'MACD Signal': lambda p: p.macd_signal(),
+    'MACD Histogram': lambda p: p.macd() - p.macd_signal(),
+    'Bollinger High': lambda p: p.sma(20) + 2 * p.bollinger_std(20),
+    'Bollinger Low': lambda p: p.sma(20) - 2 * p.bollinger_std(20),
+    'ATR': lambda p: p.atr(14),
+    'ADX': _adx,
+    'DMI+': lambda p: _directional_index(p, 'pos'),
+    'DMI-': lambda p: _directional_index(p, 'neg'),
+    'Stochastic Oscillator': lambda p: 100 * _divide(p.close - p.lowest_low(14), p.highest_high(14) - p.lowest_low(14)),
+    'Williams %R': lambda p: -100 * _divide(p.highest_high(14) - p.close, p.highest_high(14) - p.lowest_low(14)),
+    'CCI': _cci,
+    'ROC': lambda p: 100 * _divide(p.close - _shift(p.close, 12), _shift(p.close, 12)),
+    'Stochastic RSI': _stoch_rsi,
+    'TSI': _tsi,
+    'DPO': _dpo,
+    'Vortex Indicator Positive': lambda p: _vortex(p, 'pos'),
+    'Vortex Indicator Negative': lambda p: _vortex(p, 'neg'),
+    'TRIX': _trix,
+    'Ulcer Index': _ulcer_index,
+    'Donchian Channel High': lambda p: p.highest_high(20),
+    'Donchian Channel Low': lambda p: p.lowest_low(20),
+    'Mass Index': _mass_index,
+    'OBV': _obv,
+    'CMF': _cmf,
+    'Aroon Up': lambda p: _aroon(p.high, 25, np.argmax),
+    'Aroon Down': lambda p: _aroon(p.low, 25, np.argmin),
+    'Fibonacci Level 0.0': lambda p: _fibonacci(p, 0.0),
+    'Fibonacci Level 0.236': lambda p: _fibonacci(p, 0.236),
+    'Fibonacci Level 0.382': lambda p: _fibonacci(p, 0.382),
+    'Fibonacci Level 0.618': lambda p: _fibonacci(p, 0.618),
+    'Fibonacci Level 1.0': lambda p: _fibonacci(p, 1.0),
+}
+
+
+def compute_indicators(data, columns):
+    """Compute the named indicator columns for an OHLCV frame.
+
+    Returns a DataFrame on the same index backed by a single float array.
+    Values a history is too short for are NaN.
+    """
+    unknown = [column for column in columns if column not in INDICATORS]
+    if unknown:
+        raise ValueError(f"Unknown indicator columns: {', '.join(unknown)}")
+    primitives = _Primitives(data)
+    block = np.empty((len(data), len(columns)))
+    if len(data):
+        for i, column in enumerate(columns):
+            block[:, i] = INDICATORS[column](primitives)
+    return pd.DataFrame(block, index=data.index, columns=list(columns))
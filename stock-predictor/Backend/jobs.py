@@ -0,0 +1,195 @@
+"""Background job queue for slow prediction requests.
+
+Jobs run on a local thread pool. Submitting a job whose key matches one
+that is still queued or running returns the existing job, so concurrent
+identical requests share a single computation. Every job keeps a list of
+events (status changes and partial results) that clients can poll or
+stream.
+
+With a shared cache configured, each job's state is also written there, so
+a status or stream request that reaches another worker process can still
+follow the job.
+"""
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from shared_cache import get_shared_cache
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', os.cpu_count() or 1))
+# Finished jobs are forgotten after this many seconds
+JOB_RETENTION = float(os.getenv('JOB_RETENTION', 3600))
+# How often a job running in another worker is re-read from the shared cache
+JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', 0.5))
+
+QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+
+
+class Job:
+    def __init__(self, key, on_change=None):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.status = QUEUED
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+        self.events = []
+        self._on_change = on_change
+        self._changed = threading.Condition()
+
+    @property
+    def done(self):
+        return self.status in (DONE, FAILED)
+
+    def publish(self, event, data=None):
+        """Record an event and wake up anyone streaming this job."""
+        with self._changed:
+            self.events.append({'event': event, 'data': data, 'time': time.time()})
+            self._changed.notify_all()
+        if self._on_change is not None:
+            self._on_change(self)
+
+    def _finish(self, status, result=None, error=None):
+        with self._changed:
+            self.status = status
+            self.result = result
+            self.error = error
+            self.finished = time.time()
+            self.events.append({'event': status, 'data': result if status == DONE else error, 'time': self.finished})
+            self._changed.notify_all()
+        if self._on_change is not None:
+            self._on_change(self)
+
+    def wait_for_events(self, seen, timeout=None):
+        """Block until there are more than `seen` events or the job is done; returns the new ones."""
+        with self._changed:
+            self._changed.wait_for(lambda: len(self.events) > seen or self.done, timeout=timeout)
+            return self.events[seen:]
+
+    def to_dict(self):
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'result': self.result,
+            'error': self.error,
+            'created': self.created,
+            'finished': self.finished,
+            'events': list(self.events),
+        }
+
+
+class SharedJob:
+    """Read-only view of a job that runs in another worker process."""
+
+    def __init__(self, shared, state):
+        self._shared = shared
+        self._state = state
+
+    @property
+    def id(self):
+        return self._state['job_id']
+
+    @property
+    def status(self):
+        return self._state['status']
+
+    @property
+    def done(self):
+        return self.status in (DONE, FAILED)
+
+    @property
+    def events(self):
+        return self._state['events']
+
+    def _reload(self):
+        state = self._shared.get(self.id)
+        if state is not None:
+            self._state = state
+
+    def wait_for_events(self, seen, timeout=None):
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            self._reload()
+            if len(self.events) > seen or self.done:
+                return self.events[seen:]
+            if deadline is not None and time.time() >= deadline:
+                return []
+            time.sleep(JOB_POLL_INTERVAL)
+
+    def to_dict(self):
+        self._reload()
+        return dict(self._state)
+
+
+class JobQueue:
+    def __init__(self, max_workers=JOB_WORKERS, retention=JOB_RETENTION, shared=None):
+        self.retention = retention
+        self.shared = shared
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._jobs = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key, func, *args, **kwargs):
+        """Queue `func(job, *args, **kwargs)` unless a job with the same key is in flight."""
+        with self._lock:
+            self._purge()
+            job = self._inflight.get(key)
+            if job is not None and not job.done:
+                return job
+            job = Job(key, on_change=self._share if self.shared is not None else None)
+            self._jobs[job.id] = job
+            self._inflight[key] = job
+        if self.shared is not None:
+            self._share(job)
+        self._executor.submit(self._run, job, func, args, kwargs)
+        return job
+
+    def _share(self, job):
+        self.shared.set_many({job.id: job.to_dict()})
+
+    def _run(self, job, func, args, kwargs):
+        job.status = RUNNING
+        job.publish(RUNNING)
+        try:
+            result = func(job, *args, **kwargs)
+        except Exception as e:
+            logger.warning(f'Job {job.id} ({job.key}) failed: {e}')
+            job._finish(FAILED, error=str(e))
+        else:
+            job._finish(DONE, result=result)
+        finally:
+            with self._lock:
+                if self._inflight.get(job.key) is job:
+                    del self._inflight[job.key]
+
+    def get(self, job_id):
+        """The job, looking in the shared cache for jobs submitted to other workers."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None and self.shared is not None:
+            state = self.shared.get(job_id, max_age=self.retention)
+            if state is not None:
+                job = SharedJob(self.shared, state)
+        return job
+
+    def _purge(self):
+        cutoff = time.time() - self.retention
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.done and job.finished < cutoff]:
+            del self._jobs[job_id]
+
+
+_queue = None
+
+
+def get_job_queue():
+    global _queue
+    if _queue is None:
+        _queue = JobQueue(shared=get_shared_cache('jobs'))
+    return _queue
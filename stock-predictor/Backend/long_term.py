@@ -0,0 +1,170 @@
+"""ARIMA long-term forecaster that reuses fitted parameters between calls.
+
+The model is ARIMA(5, 1, 0) on closing prices; the single order of
+differencing turns it into an AR(5) on daily price changes. Fitted
+parameters are persisted per symbol. When new bars arrive the last fitted
+results are extended with `results.append` (or the stored parameters are
+re-applied with one Kalman filter pass) instead of re-estimating them, and a
+warm-started refit only happens after `refit_bars` new bars.
+"""
+import json
+import logging
+import os
+import threading
+import warnings
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from atomic_files import atomic_write
+from metrics import span
+
+logger = logging.getLogger(__name__)
+
+ARIMA_ORDER = (5, 1, 0)
+DEFAULT_STATE_DIR = os.getenv(
+    'LONG_TERM_STATE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'arima')
+)
+# New bars tolerated before the parameters are re-estimated
+LONG_TERM_REFIT_BARS = int(os.getenv('LONG_TERM_REFIT_BARS', 20))
+LONG_TERM_HORIZON = int(os.getenv('LONG_TERM_HORIZON', 30))
+LONG_TERM_YEARS = int(os.getenv('LONG_TERM_YEARS', 5))
+# Fitted results kept in memory; each holds the full state space of its window
+LONG_TERM_CACHE_SIZE = int(os.getenv('LONG_TERM_CACHE_SIZE', 8))
+
+
+class LongTermForecaster:
+    def __init__(self, root=DEFAULT_STATE_DIR, order=ARIMA_ORDER,
+                 refit_bars=LONG_TERM_REFIT_BARS, years=LONG_TERM_YEARS, max_entries=LONG_TERM_CACHE_SIZE):
+        self.root = root
+        self.order = order
+        self.refit_bars = refit_bars
+        self.years = years
+        self.max_entries = max_entries
+        self._results = OrderedDict()  # symbol -> (results, last_bar), least recently used first
+        self._results_lock = threading.Lock()
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        self.fits = 0
+        self.appends = 0
+        self.filters = 0
+
+    def _path(self, symbol):
+        return os.path.join(self.root, symbol.replace('/', '_') + '.json')
+
+    def _lock(self, symbol):
+        with self._locks_guard:
+            return self._locks.setdefault(symbol, threading.Lock())
+
+    def _load_state(self, symbol):
+        path = self._path(symbol)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path) as f:
+                state = json.load(f)
+        except Exception as e:
+            logger.warning(f'Discarding unreadable ARIMA state for {symbol}: {e}')
+            return None
+        if tuple(state.get('order', ())) != tuple(self.order):
+            return None
+        return state
+
+    def _save_state(self, symbol, params, estimated_through):
+        os.makedirs(self.root, exist_ok=True)
+        state = {
+            'order': list(self.order),
+            'params': [float(p) for p in params],
+            'estimated_through': estimated_through.strftime('%Y-%m-%d'),
+        }
+        with atomic_write(self._path(symbol)) as f:
+            json.dump(state, f)
+
+    def _model(self, window):
+        # statsmodels takes about a second to import, so only on first use
+        from statsmodels.tsa.arima.model import ARIMA
+        return ARIMA(window.to_numpy(), order=self.order)
+
+    def _cached(self, symbol):
+        with self._results_lock:
+            if symbol not in self._results:
+                return None
+            self._results.move_to_end(symbol)
+            return self._results[symbol]
+
+    def _remember(self, symbol, results, last_bar):
+        with self._results_lock:
+            self._results[symbol] = (results, last_bar)
+            self._results.move_to_end(symbol)
+            while len(self._results) > self.max_entries:
+                self._results.popitem(last=False)
+
+    def _window(self, data):
+        close = data['Close'].dropna()
+        return close[close.index >= close.index[-1] - pd.DateOffset(years=self.years)]
+
+    def _fit(self, symbol, window, start_params=None):
+        with warnings.catch_warnings(), span('arima_fit'):
+            # Warm starts can leave the optimizer mildly unconverged; the fit is still usable
+            warnings.simplefilter('ignore')
+            results = self._model(window).fit(start_params=start_params)
+        self._save_state(symbol, results.params, window.index[-1])
+        self.fits += 1
+        return results
+
+    def results(self, symbol, data):
+        """Fitted results whose last observation is the last bar of `data`."""
+        with self._lock(symbol):
+            window = self._window(data)
+            last_bar = window.index[-1]
+            cached = self._cached(symbol)
+            if cached is not None and cached[1] == last_bar:
+                return cached[0]
+
+            state = self._load_state(symbol)
+            if state is None:
+                results = self._fit(symbol, window)
+            else:
+                bars_since_fit = int((window.index > pd.Timestamp(state['estimated_through'])).sum())
+                if bars_since_fit >= self.refit_bars:
+                    results = self._fit(symbol, window, start_params=np.asarray(state['params']))
+                elif cached is not None and cached[1] in window.index:
+                    # Extend the state space with the new bars; parameters stay fixed
+                    with span('arima_append'):
+                        results = cached[0].append(window[window.index > cached[1]].to_numpy())
+                    self.appends += 1
+                else:
+                    with span('arima_filter'):
+                        results = self._model(window).filter(np.asarray(state['params']))
+                    self.filters += 1
+            self._remember(symbol, results, last_bar)
+            return results
+
+    def discard(self, symbol):
+        """Forget the fitted results and stored parameters of a symbol."""
+        with self._lock(symbol):
+            with self._results_lock:
+                self._results.pop(symbol, None)
+            try:
+                os.remove(self._path(symbol))
+            except FileNotFoundError:
+                pass
+
+    def forecast(self, symbol, data, steps=LONG_TERM_HORIZON):
+        """Closing-price path for the next `steps` business days."""
+        results = self.results(symbol, data)
+        with span('arima_forecast'):
+            path = np.asarray(results.forecast(steps))
+        dates = pd.bdate_range(data.index[-1] + pd.Timedelta(days=1), periods=steps, name='Date')
+        return pd.Series(path, index=dates, name='Close')
+
+
+_forecaster = None
+
+
+def get_forecaster():
+    global _forecaster
+    if _forecaster is None:
+        _forecaster = LongTermForecaster()
+    return _forecaster
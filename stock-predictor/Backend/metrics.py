@@ -0,0 +1,139 @@
+"""Stage timings, Prometheus-style histograms and per-request profiling.
+
+Code marks its stages with `span('name')` (or `@timed('name')`). Every span
+is observed in the `stocksense_stage_seconds` histogram, served with the
+request latencies at `/metrics`. A request sent with `X-Profile: 1` also
+gets a `Server-Timing` header listing the spans that ran in its own thread.
+Work done in the job queue or the model process pool is counted in the
+histograms of the process that ran it but not in the request's breakdown.
+"""
+import contextvars
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g, request
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_profile = contextvars.ContextVar('profile', default=None)
+
+
+class Histogram:
+    def __init__(self, name, documentation, labels, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts, sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def _label_text(self, label_values, extra=None):
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labels, label_values)]
+        if extra:
+            pairs.append(extra)
+        return '{' + ','.join(pairs) + '}' if pairs else ''
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = {key: (list(counts), total, count) for key, (counts, total, count) in self._series.items()}
+        for label_values, (counts, total, count) in sorted(series.items()):
+            labels = self._label_text(label_values)
+            for bound, bucket_count in zip(self.buckets, counts):
+                bucket_labels = self._label_text(label_values, 'le="%s"' % bound)
+                lines.append(f'{self.name}_bucket{bucket_labels} {bucket_count}')
+            bucket_labels = self._label_text(label_values, 'le="+Inf"')
+            lines.append(f'{self.name}_bucket{bucket_labels} {count}')
+            lines.append(f'{self.name}_sum{labels} {total}')
+            lines.append(f'{self.name}_count{labels} {count}')
+        return '\n'.join(lines)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+STAGE_SECONDS = Histogram('stocksense_stage_seconds', 'Time spent in each pipeline stage.', ['stage'])
+REQUEST_SECONDS = Histogram('stocksense_request_seconds', 'HTTP request latency.', ['endpoint', 'method', 'status'])
+HISTOGRAMS = [STAGE_SECONDS, REQUEST_SECONDS]
+
+
+@contextmanager
+def span(stage):
+    """Time the enclosed block as `stage`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage)
+        profile = _profile.get()
+        if profile is not None:
+            profile.append((stage, elapsed))
+
+
+def timed(stage):
+    """Decorator form of `span`."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def render_metrics():
+    return '\n'.join(histogram.render() for histogram in HISTOGRAMS) + '\n'
+
+
+def _server_timing(profile, total):
+    # Repeated stages (e.g. one fit per symbol) are summed
+    totals = {}
+    for stage, elapsed in profile:
+        totals[stage] = totals.get(stage, 0.0) + elapsed
+    entries = [f'{stage.replace(".", "-")};dur={elapsed * 1000:.1f}' for stage, elapsed in totals.items()]
+    entries.append(f'total;dur={total * 1000:.1f}')
+    return ', '.join(entries)
+
+
+def init_metrics(app):
+    """Time every request, add the profiling header and serve /metrics."""
+
+    @app.before_request
+    def start_timer():
+        g.request_start = time.perf_counter()
+        if request.headers.get('X-Profile', '').lower() in ['1', 'true']:
+            g.profile = []
+            _profile.set(g.profile)
+
+    @app.after_request
+    def record_request(response):
+        start = g.pop('request_start', None)
+        if start is None:
+            return response
+        elapsed = time.perf_counter() - start
+        endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        REQUEST_SECONDS.observe(elapsed, endpoint, request.method, str(response.status_code))
+        profile = g.pop('profile', None)
+        if profile is not None:
+            _profile.set(None)
+            response.headers['Server-Timing'] = _server_timing(profile, elapsed)
+        return response
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        return app.response_class(render_metrics(), mimetype='text/plain; version=0.0.4')
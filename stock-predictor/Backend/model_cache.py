@@ -0,0 +1,130 @@
+import glob
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+from atomic_files import atomic_write
+
+logger = logging.getLogger(__name__)
+
+
+def feature_set_id(name, columns=None):
+    """Short stable id for a model family and the columns it was trained on."""
+    if columns is None:
+        return name
+    digest = hashlib.sha1('|'.join(columns).encode()).hexdigest()[:10]
+    return f'{name}-{digest}'
+
+
+class ModelCache:
+    """LRU cache of fitted models with an optional joblib tier on disk.
+
+    Keys are `(symbol, target, feature_set, last_bar)`. Storing a model for a
+    newer bar evicts every older model of the same symbol, target and feature
+    set, so a cached model never outlives the data it was trained on.
+
+    A fitted forest on a long history pickles to tens of megabytes and every
+    process keeps its own LRU, so only a few stay in memory; the joblib tier
+    (MODEL_CACHE_DIR) is the place for the rest.
+    """
+
+    def __init__(self, max_entries=4, directory=None):
+        self.max_entries = max_entries
+        self.directory = directory
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _symbol_prefix(self, symbol):
+        safe_symbol = symbol.replace('/', '_').replace('.', '_')
+        return os.path.join(self.directory, f'{safe_symbol}__')
+
+    def _file_prefix(self, symbol, target, feature_set):
+        return self._symbol_prefix(symbol) + f'{target}__{feature_set}__'
+
+    def _path(self, key):
+        symbol, target, feature_set, last_bar = key
+        return self._file_prefix(symbol, target, feature_set) + f'{last_bar:%Y%m%d}.joblib'
+
+    def _evict_older(self, key):
+        symbol, target, feature_set, _ = key
+        for old_key in [k for k in self._entries if k[:3] == key[:3] and k != key]:
+            del self._entries[old_key]
+        if self.directory:
+            for path in glob.glob(glob.escape(self._file_prefix(symbol, target, feature_set)) + '*.joblib'):
+                if path != self._path(key):
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass  # Already evicted by another process
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+        if self.directory and os.path.exists(self._path(key)):
+            try:
+                import joblib
+                model = joblib.load(self._path(key))
+            except Exception as e:
+                logger.warning(f'Discarding unreadable cached model {self._path(key)}: {e}')
+            else:
+                with self._lock:
+                    self._store(key, model)
+                    self.hits += 1
+                return model
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def _store(self, key, model):
+        self._evict_older(key)
+        self._entries[key] = model
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def put(self, key, model):
+        with self._lock:
+            self._store(key, model)
+        if self.directory:
+            import joblib
+            with atomic_write(self._path(key), 'wb') as f:
+                joblib.dump(model, f)
+
+    def get_or_fit(self, key, fit):
+        """Return the cached model for `key`, calling `fit()` on a miss."""
+        model = self.get(key)
+        if model is None:
+            model = fit()
+            self.put(key, model)
+        return model
+
+    def discard(self, symbol):
+        """Drop every model of a symbol, e.g. after its price history was revised."""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == symbol]:
+                del self._entries[key]
+        if self.directory:
+            for path in glob.glob(glob.escape(self._symbol_prefix(symbol)) + '*.joblib'):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+model_cache = ModelCache(
+    max_entries=int(os.getenv('MODEL_CACHE_SIZE', 4)),
+    directory=os.getenv('MODEL_CACHE_DIR') or None
+)
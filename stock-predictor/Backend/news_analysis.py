@@ -1,26 +1,204 @@
-import requests
-from utils import extract_stock_symbol_from_title
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from utils import CompanyMatcher, extract_stock_symbols_from_title
+from metrics import span, timed
+from http_client import FetchError, get_http_client
+from shared_cache import SHARED_CACHE_PATH, get_shared_cache
+from atomic_files import try_lock
+
+logger = logging.getLogger(__name__)
+
+NEWS_API_URL = os.getenv('NEWS_API_URL', 'https://share-market-news-api-india.p.rapidapi.com/marketNews')
+NEWS_API_HOST = os.getenv('NEWS_API_HOST', 'share-market-news-api-india.p.rapidapi.com')
+NEWS_API_KEY = os.getenv('NEWS_API_KEY', '')
+NEWS_REFRESH_TTL = float(os.getenv('NEWS_REFRESH_TTL', 900))
+NEWS_MAX_RETRIES = int(os.getenv('NEWS_MAX_RETRIES', 4))
+NEWS_BACKOFF_SECONDS = float(os.getenv('NEWS_BACKOFF_SECONDS', 2))
+NEWS_REQUEST_TIMEOUT = float(os.getenv('NEWS_REQUEST_TIMEOUT', 10))
+# How often processes that do not fetch the news pick up the shared copy
+NEWS_SYNC_INTERVAL = float(os.getenv('NEWS_SYNC_INTERVAL', 30))
 
 news_articles_cache = []
+news_version = None
+news_metrics = {
+    'last_refresh': None,
+    'last_attempt': None,
+    'refresh_count': 0,
+    'failure_count': 0,
+    'consecutive_failures': 0,
+    'last_error': None,
+}
+_metrics_lock = threading.Lock()
+_refresher = None
+_news_state = (news_version, news_articles_cache)
+_suggestions = (None, {})
 
-def fetch_and_cache_news():
-    global news_articles_cache
-    url = "https://share-market-news-api-india.p.rapidapi.com/marketNews"
+@timed('news_fetch')
+def fetch_news(url=None):
+    """Request the market news feed and return its list of articles."""
     headers = {
-        "x-rapidapi-key": "",  # Replace with your actual API key
-        "x-rapidapi-host": "share-market-news-api-india.p.rapidapi.com"
+        "x-rapidapi-key": NEWS_API_KEY,
+        "x-rapidapi-host": NEWS_API_HOST
     }
-    
-    response = requests.get(url, headers=headers)
-    print(response.status_code)
-    try:
-        news_articles_cache = response.json()
-    except requests.exceptions.JSONDecodeError as e:
-        fetch_and_cache_news()
+    articles = get_http_client().get_json(url or NEWS_API_URL, headers=headers, timeout=NEWS_REQUEST_TIMEOUT)
+    if not isinstance(articles, list):
+        raise ValueError(f'Unexpected news payload of type {type(articles).__name__}')
+    return articles
+
+def _record_attempt(error=None):
+    with _metrics_lock:
+        news_metrics['last_attempt'] = time.time()
+        if error is None:
+            news_metrics['last_refresh'] = news_metrics['last_attempt']
+            news_metrics['refresh_count'] += 1
+            news_metrics['consecutive_failures'] = 0
+            news_metrics['last_error'] = None
+        else:
+            news_metrics['failure_count'] += 1
+            news_metrics['consecutive_failures'] += 1
+            news_metrics['last_error'] = str(error)
+
+def fetch_and_cache_news(max_retries=NEWS_MAX_RETRIES, backoff=NEWS_BACKOFF_SECONDS, url=None):
+    """Refresh the news cache, retrying with exponential backoff.
+
+    On success the cached list is replaced in one assignment. After
+    `max_retries` failed retries the previous articles are kept and False
+    is returned.
+    """
+    global news_articles_cache
+    for attempt in range(max_retries + 1):
+        try:
+            articles = fetch_news(url)
+        except (FetchError, ValueError) as e:
+            _record_attempt(e)
+            logger.warning(f'News fetch attempt {attempt + 1} failed: {e}')
+            if attempt == max_retries:
+                return False
+            time.sleep(backoff * 2 ** attempt)
+        else:
+            _swap_cache(articles)
+            _record_attempt()
+            logger.info(f'Cached {len(articles)} news articles.')
+            return True
+
+def _swap_cache(articles):
+    """Publish a new article list together with its content version."""
+    global news_articles_cache, news_version, _news_state
+    version = hashlib.sha1(json.dumps(articles, sort_keys=True, default=str).encode()).hexdigest()[:16]
+    _news_state = (version, articles)
+    news_articles_cache = articles
+    news_version = version
+
+def get_suggestions(matcher, mappings_version=None):
+    """Buy suggestions for the cached news, recomputed only when the news or mappings change.
+
+    Returns `(version, suggestions)`; the version changes whenever the
+    suggestions may have changed.
+    """
+    global _suggestions
+    articles_version, articles = _news_state
+    version = f'{articles_version}:{mappings_version}'
+    cached_version, suggestions = _suggestions
+    if cached_version != version:
+        with span('news_analyze'):
+            suggestions = analyze_news_titles(articles, matcher)
+        _suggestions = (version, suggestions)
+    return version, suggestions
+
+def get_news_metrics():
+    with _metrics_lock:
+        metrics = dict(news_metrics)
+    metrics['cached_articles'] = len(news_articles_cache)
+    metrics['version'] = news_version
+    return metrics
+
+class NewsRefresher(threading.Thread):
+    """Daemon thread that refreshes the news cache every `ttl` seconds.
+
+    With `fetch_first` the first refresh happens as soon as the thread
+    starts, so the app can serve requests while the news loads.
+
+    With a shared cache configured, only the process holding the news lock
+    calls the news API; it publishes the articles to the shared cache and
+    every other worker copies them from there. If that process exits, the
+    lock passes to another worker.
+    """
+
+    def __init__(self, ttl=NEWS_REFRESH_TTL, fetch_first=False, shared=None, sync_interval=NEWS_SYNC_INTERVAL):
+        super().__init__(name='news-refresher', daemon=True)
+        self.ttl = ttl
+        self.fetch_first = fetch_first
+        self.shared = shared
+        self.sync_interval = sync_interval
+        self._stopped = threading.Event()
+        self._lock_file = None
+        self._last_attempt = 0.0
+
+    def _refresh(self):
+        try:
+            return fetch_and_cache_news()
+        except Exception as e:
+            logger.error(f'News refresh failed: {e}')
+            return False
+
+    def _is_leader(self):
+        if self._lock_file is None:
+            self._lock_file = try_lock(SHARED_CACHE_PATH + '.news.lock')
+            if self._lock_file is None:
+                return False
+            logger.info('This process now refreshes the shared news cache.')
+        return True
+
+    def _sync(self):
+        """Fetch the news if this process leads and the shared copy is old, then adopt the shared copy."""
+        entry = self.shared.get_many(['articles']).get('articles')
+        now = time.time()
+        stale = entry is None or now - entry[1] >= self.ttl
+        if stale and now - self._last_attempt >= self.ttl and self._is_leader():
+            self._last_attempt = now
+            if self._refresh():
+                self.shared.set_many({'articles': news_articles_cache})
+            return
+        if entry is not None:
+            articles, refreshed = entry
+            if articles != news_articles_cache:
+                _swap_cache(articles)
+                with _metrics_lock:
+                    news_metrics['last_refresh'] = refreshed
+
+    def run(self):
+        if self.shared is not None:
+            while True:
+                try:
+                    self._sync()
+                except Exception as e:
+                    logger.error(f'News sync failed: {e}')
+                if self._stopped.wait(min(self.ttl, self.sync_interval)):
+                    return
+        if self.fetch_first:
+            self._refresh()
+        while not self._stopped.wait(self.ttl):
+            self._refresh()
+
+    def stop(self):
+        self._stopped.set()
+
+def start_news_refresher(ttl=NEWS_REFRESH_TTL, fetch_first=False):
+    """Start the background refresher once per process."""
+    global _refresher
+    if _refresher is None or not _refresher.is_alive():
+        _refresher = NewsRefresher(ttl, fetch_first, shared=get_shared_cache('news'))
+        _refresher.start()
+    return _refresher
 
 def analyze_news_titles(news_articles, mappings):
     positive_indicators = ['good buy', 'buy', 'positive outlook', 'strong performance']
     
+    matcher = mappings if isinstance(mappings, CompanyMatcher) else CompanyMatcher(mappings)
     suggestions = {}
     
     for article in news_articles:
@@ -28,8 +206,7 @@ def analyze_news_titles(news_articles, mappings):
         url = article.get('URL', '')
         
         if any(indicator in title for indicator in positive_indicators):
-            stock_symbol = extract_stock_symbol_from_title(title, mappings)
-            if stock_symbol:
+            for stock_symbol in extract_stock_symbols_from_title(title, matcher):
                 suggestions[stock_symbol] = {
                     'reason_to_buy': title,
                     'url': url
@@ -0,0 +1,111 @@
+"""Nightly job that precomputes predictions for every listed symbol.
+
+Symbols from the company names CSV are processed in batches through
+`predict_batch`, which refreshes prices in bulk and fits the models on all
+cores. After each batch the results go to the prediction store and the run's
+checkpoint is updated, so an interrupted run picks up where it stopped when
+started again with the same run id (today's date by default).
+
+    python precompute.py                  # e.g. from cron: 30 1 * * 1-6
+    python precompute.py --symbols TCS INFY --batch-size 2
+    python precompute.py --restart        # ignore today's checkpoint
+"""
+import argparse
+import json
+import logging
+import os
+import time
+from datetime import date
+
+import pandas as pd
+
+from atomic_files import atomic_write
+from batch_predict import predict_batch
+from predictions import get_prediction_store, make_record, stored_last_bars
+from utils import DEFAULT_COMPANY_NAMES_CSV
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_DIR = os.getenv(
+    'PRECOMPUTE_CHECKPOINT_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'precompute')
+)
+PRECOMPUTE_BATCH_SIZE = int(os.getenv('PRECOMPUTE_BATCH_SIZE', 32))
+
+
+class Checkpoint:
+    """Symbols finished (or failed) in one run, saved after every batch."""
+
+    def __init__(self, run_id, directory=CHECKPOINT_DIR):
+        self.path = os.path.join(directory, f'{run_id}.json')
+        self.done = set()
+        self.failed = {}
+
+    def load(self):
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                state = json.load(f)
+            self.done = set(state['done'])
+            self.failed = state['failed']
+        return self
+
+    def record(self, done, failed):
+        self.done.update(done)
+        for symbol in done:
+            self.failed.pop(symbol, None)
+        self.failed.update(failed)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with atomic_write(self.path) as f:
+            json.dump({'done': sorted(self.done), 'failed': self.failed}, f)
+
+
+def load_universe(csv_path=DEFAULT_COMPANY_NAMES_CSV):
+    return list(dict.fromkeys(pd.read_csv(csv_path)['Symbol'].dropna().astype(str)))
+
+
+def run(symbols, run_id=None, batch_size=PRECOMPUTE_BATCH_SIZE, restart=False, retry_failed=False):
+    """Precompute predictions for `symbols`; returns the checkpoint."""
+    checkpoint = Checkpoint(run_id or date.today().isoformat())
+    if not restart:
+        checkpoint.load()
+    skip = checkpoint.done if retry_failed else checkpoint.done | set(checkpoint.failed)
+    pending = [symbol for symbol in symbols if symbol not in skip]
+    logger.info(f'{len(pending)} of {len(symbols)} symbols to precompute')
+
+    store = get_prediction_store()
+    start = time.perf_counter()
+    for offset in range(0, len(pending), batch_size):
+        batch = pending[offset:offset + batch_size]
+        try:
+            results, errors = predict_batch(batch)
+        except Exception as e:
+            # A failed bulk download should not end the run
+            logger.error(f'Batch starting at {batch[0]} failed: {e}')
+            results, errors = {}, {symbol: str(e) for symbol in batch}
+        last_bars = stored_last_bars(results)
+        store.put_many([make_record(symbol, result, last_bar=last_bars[symbol]) for symbol, result in results.items()])
+        checkpoint.record(results, errors)
+        finished = offset + len(batch)
+        rate = finished / (time.perf_counter() - start)
+        logger.info(f'{finished}/{len(pending)} symbols, {len(checkpoint.failed)} failed, {rate:.2f} symbols/s')
+    return checkpoint
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--symbols', nargs='*', help='only these symbols (default: every symbol in the CSV)')
+    parser.add_argument('--csv', default=DEFAULT_COMPANY_NAMES_CSV)
+    parser.add_argument('--run-id', help='checkpoint name (default: today)')
+    parser.add_argument('--batch-size', type=int, default=PRECOMPUTE_BATCH_SIZE)
+    parser.add_argument('--restart', action='store_true', help='ignore the existing checkpoint')
+    parser.add_argument('--retry-failed', action='store_true', help='retry symbols that failed earlier in this run')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    symbols = args.symbols or load_universe(args.csv)
+    checkpoint = run(symbols, args.run_id, args.batch_size, args.restart, args.retry_failed)
+    print(f'{len(checkpoint.done)} symbols precomputed, {len(checkpoint.failed)} failed')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+"""Precomputed predictions and how the routes read them.
+
+`precompute.py` fills a prediction store for the whole symbol universe;
+`get_predictions` serves from it and only computes symbols live when their
+stored prediction is missing, older than PREDICTION_MAX_AGE, or made before
+the last bar now in the price store. Live results are written back, so the
+next request for the same symbol is served from the store as well.
+"""
+import json
+import logging
+import os
+import time
+
+from pymongo import ReplaceOne
+
+from atomic_files import atomic_write
+from batch_predict import predict_batch
+from http_client import concurrently
+from price_store import get_store
+from quotes import get_quotes
+
+logger = logging.getLogger(__name__)
+
+PREDICTION_STORE = os.getenv('PREDICTION_STORE', 'disk')
+PREDICTION_DIR = os.getenv(
+    'PREDICTION_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'predictions')
+)
+PREDICTION_MAX_AGE = float(os.getenv('PREDICTION_MAX_AGE', 24 * 3600))
+
+
+def make_record(symbol, result, computed_at=None, last_bar=None):
+    """`last_bar` is the date of the last price bar the prediction was made from."""
+    return {
+        'symbol': symbol,
+        'short_term': [float(price) for price in result['short_term']],
+        'long_term': float(result['long_term']),
+        'current_price': float(result['current_price']),
+        'computed_at': computed_at or time.time(),
+        'last_bar': last_bar,
+    }
+
+
+def is_fresh(record, max_age=PREDICTION_MAX_AGE, last_bar=None):
+    """Whether `record` is recent and, given the last stored bar, was made from it."""
+    if record is None or time.time() - record['computed_at'] >= max_age:
+        return False
+    return last_bar is None or (record.get('last_bar') or '') >= last_bar
+
+
+def stored_last_bars(symbols):
+    """Date of the last bar in the price store for each NSE symbol."""
+    store = get_store()
+    return {symbol: store.last_bar(symbol + '.NS') for symbol in symbols}
+
+
+class DiskPredictionStore:
+    """One JSON file per symbol, replaced atomically."""
+
+    def __init__(self, directory=PREDICTION_DIR):
+        self.directory = directory
+
+    def _path(self, symbol):
+        return os.path.join(self.directory, symbol.replace('/', '_') + '.json')
+
+    def get(self, symbols):
+        records = {}
+        for symbol in symbols:
+            path = self._path(symbol)
+            if not os.path.exists(path):
+                continue
+            try:
+                with open(path) as f:
+                    records[symbol] = json.load(f)
+            except Exception as e:
+                logger.warning(f'Ignoring unreadable prediction for {symbol}: {e}')
+        return records
+
+    def put_many(self, records):
+        os.makedirs(self.directory, exist_ok=True)
+        for record in records:
+            with atomic_write(self._path(record['symbol'])) as f:
+                json.dump(record, f)
+
+
+class MongoPredictionStore:
+    """Predictions in a Mongo collection keyed by symbol."""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.collection.create_index('symbol', unique=True, name='symbol_unique')
+
+    def get(self, symbols):
+        cursor = self.collection.find({'symbol': {'$in': list(symbols)}}, {'_id': 0})
+        return {record['symbol']: record for record in cursor}
+
+    def put_many(self, records):
+        operations = [ReplaceOne({'symbol': record['symbol']}, record, upsert=True) for record in records]
+        if operations:
+            self.collection.bulk_write(operations, ordered=False)
+
+
+_store = None
+
+
+def get_prediction_store():
+    global _store
+    if _store is None:
+        if PREDICTION_STORE == 'mongo':
+            from db_operations import db
+            _store = MongoPredictionStore(db['Predictions'])
+        else:
+            _store = DiskPredictionStore()
+    return _store
+
+
+def get_predictions(symbols, max_age=PREDICTION_MAX_AGE):
+    """Like `predict_batch`, but served from the prediction store where possible.
+
+    Precomputed entries get their current price from the quote cache, since
+    it moves during the day while the predictions do not. Those quotes are
+    fetched while the missing symbols are predicted.
+    """
+    symbols = list(dict.fromkeys(symbols))
+    store = get_prediction_store()
+    last_bars = stored_last_bars(symbols)
+    stored = {
+        symbol: record for symbol, record in store.get(symbols).items()
+        if is_fresh(record, max_age, last_bars.get(symbol))
+    }
+    results = {
+        symbol: {
+            'short_term': record['short_term'],
+            'long_term': record['long_term'],
+            'current_price': record['current_price'],
+        }
+        for symbol, record in stored.items()
+    }
+    missing = [symbol for symbol in symbols if symbol not in stored]
+    (live, errors), prices = concurrently(
+        lambda: predict_batch(missing) if missing else ({}, {}),
+        lambda: get_quotes(list(stored)) if stored else {},
+    )
+    for symbol in stored:
+        if symbol in prices:
+            results[symbol]['current_price'] = prices[symbol]
+    if live:
+        last_bars = stored_last_bars(live)
+        store.put_many([make_record(symbol, result, last_bar=last_bars[symbol]) for symbol, result in live.items()])
+        results.update(live)
+    return results, errors
+
+
+def get_prediction(symbol, term, max_age=PREDICTION_MAX_AGE):
+    """The stored prediction for one symbol and term, or None if there is no fresh one."""
+    record = get_prediction_store().get([symbol]).get(symbol)
+    if not is_fresh(record, max_age, stored_last_bars([symbol])[symbol]) or term not in ('short_term', 'long_term'):
+        return None
+    return record[term]
@@ -0,0 +1,441 @@
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+
+from atomic_files import atomic_write, file_lock
+from http_client import FetchError, concurrently, get_http_client
+from metrics import span
+
+logger = logging.getLogger(__name__)
+
+PRICE_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+DEFAULT_STORE_DIR = os.getenv(
+    'PRICE_STORE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'prices')
+)
+# 'chart' fetches over the pooled HTTP client, 'yfinance' through the yfinance package
+PRICE_SOURCE = os.getenv('PRICE_SOURCE', 'chart')
+YAHOO_CHART_URL = os.getenv('YAHOO_CHART_URL', 'https://query1.finance.yahoo.com/v8/finance/chart/{symbol}')
+# Stored bars fetched again on each refresh to detect upstream revisions (splits, bonus issues)
+PRICE_OVERLAP_BARS = int(os.getenv('PRICE_OVERLAP_BARS', 5))
+PRICE_REVISION_TOLERANCE = 1e-4
+
+
+def normalize_ohlcv(frame, symbol=None):
+    """Reduce a downloaded frame to tz-naive daily OHLCV rows."""
+    if frame is None or frame.empty:
+        return pd.DataFrame(columns=PRICE_COLUMNS, index=pd.DatetimeIndex([], name='Date'), dtype=float)
+    if isinstance(frame.columns, pd.MultiIndex):
+        # yfinance returns (field, ticker) columns even for a single ticker
+        level = 1 if symbol in frame.columns.get_level_values(1) else 0
+        frame = frame.xs(symbol, axis=1, level=level) if symbol is not None else frame.droplevel(1, axis=1)
+    frame = frame[PRICE_COLUMNS].astype(float)
+    index = pd.to_datetime(frame.index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    frame.index = index.normalize().rename('Date')
+    frame = frame.dropna(subset=['Close'])
+    return frame[~frame.index.duplicated(keep='last')].sort_index()
+
+
+def _failed_downloads():
+    """Tickers the last yfinance download reported as failed."""
+    from yfinance import shared
+    return set(getattr(shared, '_ERRORS', {}))
+
+
+class YahooFetcher:
+    """Fetch daily bars from Yahoo Finance.
+
+    Like every fetcher, `fetch` raises FetchError when the download fails and
+    `fetch_many` leaves failed symbols out, so that a failure is never
+    mistaken for "no new bars".
+    """
+
+    def fetch(self, symbol, start=None):
+        import yfinance as yf  # Deferred: slow to import
+        if start is None:
+            data = yf.download(symbol, period='max', progress=False, auto_adjust=False)
+        else:
+            data = yf.download(symbol, start=start, progress=False, auto_adjust=False)
+        if symbol in _failed_downloads():
+            raise FetchError(f'Price download failed for {symbol}')
+        return normalize_ohlcv(data, symbol)
+
+    def fetch_many(self, symbols, start=None):
+        """Download several tickers in one request; returns {symbol: bars}."""
+        import yfinance as yf
+        if start is None:
+            data = yf.download(symbols, period='max', group_by='ticker', progress=False, auto_adjust=False)
+        else:
+            data = yf.download(symbols, start=start, group_by='ticker', progress=False, auto_adjust=False)
+        failed = _failed_downloads()
+        return {
+            symbol: normalize_ohlcv(_ticker_frame(data, symbol), symbol)
+            for symbol in symbols if symbol not in failed
+        }
+
+    def latest_close(self, symbols):
+        """Last traded price for each symbol from a single one-day download."""
+        import yfinance as yf
+        data = yf.download(symbols, period='1d', group_by='ticker', progress=False, auto_adjust=False)
+        prices = {}
+        for symbol in symbols:
+            bars = normalize_ohlcv(_ticker_frame(data, symbol), symbol)
+            if not bars.empty:
+                prices[symbol] = float(bars['Close'].iloc[-1])
+        return prices
+
+
+def _chart_result(payload):
+    return (payload.get('chart', {}).get('result') or [None])[0] or {}
+
+
+def _chart_meta(payload):
+    return _chart_result(payload).get('meta', {})
+
+
+def chart_to_ohlcv(payload):
+    """Daily bars from a Yahoo chart API response."""
+    result = _chart_result(payload)
+    if not result.get('timestamp'):
+        return normalize_ohlcv(None)
+    offset = result.get('meta', {}).get('gmtoffset') or 0
+    ohlcv = result['indicators']['quote'][0]
+    frame = pd.DataFrame(
+        {column: ohlcv.get(column.lower()) for column in PRICE_COLUMNS},
+        index=pd.to_datetime(np.asarray(result['timestamp']) + offset, unit='s'),
+    )
+    return normalize_ohlcv(frame)
+
+
+class YahooChartFetcher:
+    """Fetch daily bars from Yahoo's chart API, one concurrent request per symbol.
+
+    Requests share the process's pooled HTTP client. Symbols whose request
+    fails are left out of the result.
+    """
+
+    def __init__(self, url=YAHOO_CHART_URL, client=None):
+        self.url = url
+        self.client = client
+
+    def _request(self, symbol, start=None, period=None):
+        params = {'interval': '1d'}
+        if period is not None:
+            params['range'] = period
+        else:
+            # A full history is asked for as a date range too; Yahoo may answer
+            # range=max with coarser than daily bars
+            params['period1'] = int(pd.Timestamp(start).timestamp()) if start is not None else 0
+            params['period2'] = int(time.time())
+        return self.url.format(symbol=quote(symbol)), params
+
+    def _download(self, symbols, start=None, period=None):
+        client = self.client or get_http_client()
+        responses = client.get_json_many([self._request(symbol, start, period) for symbol in symbols])
+        frames = {}
+        for symbol, payload in zip(symbols, responses):
+            if isinstance(payload, Exception):
+                logger.warning(f'Price download failed for {symbol}: {payload}')
+                continue
+            granularity = _chart_meta(payload).get('dataGranularity', '1d')
+            if granularity != '1d':
+                logger.warning(f'Price download for {symbol} returned {granularity} bars instead of daily')
+                continue
+            frames[symbol] = chart_to_ohlcv(payload)
+        return frames
+
+    def fetch(self, symbol, start=None):
+        frames = self._download([symbol], start)
+        if symbol not in frames:
+            raise FetchError(f'Price download failed for {symbol}')
+        return frames[symbol]
+
+    def fetch_many(self, symbols, start=None):
+        return self._download(symbols, start)
+
+    def latest_close(self, symbols):
+        prices = {}
+        for symbol, bars in self._download(symbols, period='5d').items():
+            if not bars.empty:
+                prices[symbol] = float(bars['Close'].iloc[-1])
+        return prices
+
+
+def default_fetcher():
+    return YahooFetcher() if PRICE_SOURCE == 'yfinance' else YahooChartFetcher()
+
+
+def _ticker_frame(data, symbol):
+    if isinstance(data.columns, pd.MultiIndex) and symbol in data.columns.get_level_values(0):
+        return data[symbol]
+    return data
+
+
+class CsvFixtureFetcher:
+    """Serve bars from `<directory>/<symbol>.csv` files instead of the network."""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def fetch(self, symbol, start=None):
+        path = os.path.join(self.directory, f'{symbol}.csv')
+        if not os.path.exists(path):
+            return normalize_ohlcv(None)
+        data = pd.read_csv(path, index_col=0, parse_dates=True)
+        data = normalize_ohlcv(data, symbol)
+        if start is not None:
+            data = data[data.index >= pd.Timestamp(start)]
+        return data
+
+    def fetch_many(self, symbols, start=None):
+        return {symbol: self.fetch(symbol, start=start) for symbol in symbols}
+
+    def latest_close(self, symbols):
+        prices = {}
+        for symbol in symbols:
+            bars = self.fetch(symbol)
+            if not bars.empty:
+                prices[symbol] = float(bars['Close'].iloc[-1])
+        return prices
+
+
+class PriceStore:
+    """Columnar on-disk OHLCV store, one directory of .npy columns per symbol.
+
+    Each refresh only asks the fetcher for bars from the last `overlap`
+    stored dates on. If those no longer match what is stored, the history was
+    revised upstream (Yahoo rescales past prices after a split or bonus
+    issue), so it is downloaded again in full and the symbol's `rewrite_listeners`
+    are called to drop state derived from the old bars. Every process calls
+    them when it first sees the new revision.
+
+    Bars for the current (unfinished) day are never persisted. A symbol is
+    only marked fresh for the day after a successful download, so a failed
+    one is retried on the next request.
+    """
+
+    def __init__(self, root=DEFAULT_STORE_DIR, fetcher=None, overlap=PRICE_OVERLAP_BARS):
+        self.root = root
+        self.fetcher = fetcher or default_fetcher()
+        self.overlap = max(1, overlap)
+        self.rewrite_listeners = []
+        self._revisions = {}  # symbol -> last revision this process has seen
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def _symbol_dir(self, symbol):
+        return os.path.join(self.root, symbol.replace('/', '_'))
+
+    @contextmanager
+    def _lock(self, symbol):
+        """Serialize updates of a symbol across threads and processes."""
+        with self._locks_guard:
+            lock = self._locks.setdefault(symbol, threading.Lock())
+        with lock, file_lock(self._symbol_dir(symbol) + '.lock'):
+            yield
+
+    def _read_meta(self, symbol):
+        path = os.path.join(self._symbol_dir(symbol), 'meta.json')
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def load(self, symbol):
+        """Return the stored bars for a symbol, or None if nothing is stored."""
+        meta = self._read_meta(symbol)
+        if meta is None:
+            return None
+        self._check_revision(symbol, meta.get('revision', 0))
+        directory = self._symbol_dir(symbol)
+        # Rows are only appended between revisions, so slicing to the row count
+        # in meta gives a consistent view even if a writer is replacing the columns.
+        rows = meta['rows']
+        dates = np.load(os.path.join(directory, 'Date.npy'), mmap_mode='r')[:rows]
+        columns = {
+            column: np.load(os.path.join(directory, f'{column}.npy'), mmap_mode='r')[:rows]
+            for column in PRICE_COLUMNS
+        }
+        return pd.DataFrame(columns, index=pd.DatetimeIndex(np.asarray(dates, dtype='datetime64[ns]'), name='Date'))
+
+    def _check_revision(self, symbol, revision):
+        seen = self._revisions.get(symbol)
+        self._revisions[symbol] = revision
+        if seen is not None and seen != revision:
+            for listener in self.rewrite_listeners:
+                try:
+                    listener(symbol)
+                except Exception as e:
+                    logger.warning(f'Rewrite listener failed for {symbol}: {e}')
+
+    def last_bar(self, symbol):
+        """Date (YYYY-MM-DD) of the last stored bar, without refreshing; None if nothing is stored."""
+        meta = self._read_meta(symbol)
+        if not meta or not meta['rows']:
+            return None
+        dates = np.load(os.path.join(self._symbol_dir(symbol), 'Date.npy'), mmap_mode='r')
+        return str(dates[meta['rows'] - 1])
+
+    def _write(self, symbol, data, fetched_on, revision=0):
+        directory = self._symbol_dir(symbol)
+        os.makedirs(directory, exist_ok=True)
+        arrays = {'Date': data.index.values.astype('datetime64[D]')}
+        arrays.update({column: data[column].to_numpy(dtype=float) for column in PRICE_COLUMNS})
+        for name, values in arrays.items():
+            with atomic_write(os.path.join(directory, f'{name}.npy'), 'wb') as f:
+                np.save(f, values)
+        with atomic_write(os.path.join(directory, 'meta.json')) as f:
+            json.dump({'rows': len(data), 'fetched_on': fetched_on, 'revision': revision}, f)
+
+    def _merge(self, stored, new_bars, today):
+        new_bars = new_bars[new_bars.index < pd.Timestamp(today)]
+        if stored is None:
+            return new_bars
+        if new_bars.empty:
+            return stored
+        merged = pd.concat([stored, new_bars])
+        return merged[~merged.index.duplicated(keep='last')].sort_index()
+
+    def _next_start(self, symbol, today):
+        """Start date for the next fetch, None for a full download, or False if fresh."""
+        stored = self.load(symbol)
+        if stored is None:
+            return None
+        if self._read_meta(symbol).get('fetched_on') == today.isoformat():
+            return False
+        if stored.empty:
+            return None
+        return stored.index[-min(self.overlap, len(stored))].strftime('%Y-%m-%d')
+
+    @staticmethod
+    def _revised(stored, new_bars):
+        """Whether `new_bars` disagree with the stored prices on the dates both cover."""
+        if stored is None or new_bars.empty:
+            return False
+        common = stored.index.intersection(new_bars.index)
+        if common.empty:
+            return False
+        prices = ['Open', 'High', 'Low', 'Close']
+        return not np.allclose(stored.loc[common, prices].to_numpy(), new_bars.loc[common, prices].to_numpy(),
+                               rtol=PRICE_REVISION_TOLERANCE, equal_nan=True)
+
+    def _append(self, symbol, new_bars, today):
+        """Merge `new_bars` into the stored history; returns False if they revise it instead."""
+        stored = self.load(symbol)
+        if self._revised(stored, new_bars[new_bars.index < pd.Timestamp(today)]):
+            return False
+        merged = self._merge(stored, new_bars, today)
+        if stored is None and merged.empty:
+            # Nothing to keep; an unknown or failing symbol is looked up again next time
+            return True
+        self._write(symbol, merged, today.isoformat(), (self._read_meta(symbol) or {}).get('revision', 0))
+        return True
+
+    def _replace(self, symbol, bars, today):
+        """Replace a revised history with a full download."""
+        bars = self._merge(None, bars, today)
+        if bars.empty:
+            logger.warning(f'Full download for revised {symbol} was empty; keeping the stored bars')
+            return
+        logger.info(f'Price history of {symbol} was revised upstream; replaced it with a full download')
+        revision = (self._read_meta(symbol) or {}).get('revision', 0) + 1
+        self._write(symbol, bars, today.isoformat(), revision)
+        self.load(symbol)  # Notifies the rewrite listeners
+
+    def refresh(self, symbol):
+        """Append any bars published since the last refresh and return the full history."""
+        with self._lock(symbol):
+            today = date.today()
+            start = self._next_start(symbol, today)
+            if start is not False:
+                try:
+                    with span('price_download'):
+                        new_bars = self.fetcher.fetch(symbol, start=start)
+                    if not self._append(symbol, new_bars, today):
+                        with span('price_download'):
+                            self._replace(symbol, self.fetcher.fetch(symbol), today)
+                except FetchError as e:
+                    # Serve what is stored and try again on the next request
+                    logger.warning(f'Could not refresh {symbol}: {e}')
+            return self.load(symbol)
+
+    def refresh_many(self, symbols):
+        """Refresh several symbols with at most two bulk downloads.
+
+        Symbols with no stored history share one full download and the stale
+        ones share one incremental download from their earliest overlap date;
+        the two downloads run concurrently. Revised symbols share a third, full
+        download. Symbols whose download failed keep their stored bars and are
+        not marked fresh.
+        """
+        today = date.today()
+        cold, stale = [], {}
+        for symbol in symbols:
+            start = self._next_start(symbol, today)
+            if start is None:
+                cold.append(symbol)
+            elif start is not False:
+                stale[symbol] = start
+        downloads = []
+        if cold:
+            downloads.append(lambda: self.fetcher.fetch_many(cold))
+        if stale:
+            downloads.append(lambda: self.fetcher.fetch_many(list(stale), start=min(stale.values())))
+        fetched = {}
+        with span('price_download'):
+            for bars in concurrently(*downloads):
+                fetched.update(bars)
+        revised = []
+        for symbol, new_bars in fetched.items():
+            with self._lock(symbol):
+                if not self._append(symbol, new_bars, today):
+                    revised.append(symbol)
+        if revised:
+            with span('price_download'):
+                full = self.fetcher.fetch_many(revised)
+            for symbol, bars in full.items():
+                with self._lock(symbol):
+                    self._replace(symbol, bars, today)
+        return {symbol: self.load(symbol) for symbol in symbols}
+
+    def get_history(self, symbol, start=None):
+        data = self.refresh(symbol)
+        if data is None:
+            return normalize_ohlcv(None)
+        if start is not None:
+            data = data[data.index >= pd.Timestamp(start)]
+        return data
+
+
+_store = None
+
+
+def get_store():
+    global _store
+    if _store is None:
+        _store = PriceStore()
+    return _store
+
+
+def on_rewrite(listener):
+    """Call `listener(symbol)` when a symbol's stored history is replaced after a revision."""
+    get_store().rewrite_listeners.append(listener)
+
+
+def set_fetcher(fetcher):
+    """Swap the data source of the default store, e.g. for a fixture provider."""
+    get_store().fetcher = fetcher
+
+
+def get_price_history(symbol, start=None):
+    return get_store().get_history(symbol, start=start)
@@ -0,0 +1,130 @@
+"""Short-lived cache of current prices for the portfolio and suggestion endpoints."""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import span
+from price_store import get_store
+from shared_cache import get_shared_cache
+
+logger = logging.getLogger(__name__)
+
+# Seconds a quote counts as fresh
+QUOTE_TTL = float(os.getenv('QUOTE_TTL', 60))
+# Seconds an expired quote may still be served while it is refreshed in the background
+QUOTE_MAX_STALE = float(os.getenv('QUOTE_MAX_STALE', 3600))
+QUOTE_STALE_WHILE_REVALIDATE = os.getenv('QUOTE_STALE_WHILE_REVALIDATE', 'True').lower() in ['true', '1', 't']
+
+
+def _latest_close(symbols):
+    tickers = {symbol + '.NS': symbol for symbol in symbols}
+    with span('quote_download'):
+        prices = get_store().fetcher.latest_close(list(tickers))
+    return {tickers[ticker]: price for ticker, price in prices.items()}
+
+
+class QuoteService:
+    """Current prices for NSE symbols with a TTL cache and batched refreshes.
+
+    Missing quotes are fetched synchronously in one batch. With
+    stale-while-revalidate on, an expired quote younger than `max_stale` is
+    returned immediately and every expired watched symbol is refreshed
+    together in the background. With a `shared` cache, quotes fetched by
+    other worker processes are reused while they are fresh.
+    """
+
+    def __init__(self, fetch=_latest_close, ttl=QUOTE_TTL, max_stale=QUOTE_MAX_STALE,
+                 stale_while_revalidate=QUOTE_STALE_WHILE_REVALIDATE, shared=None):
+        self._fetch = fetch
+        self.shared = shared
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.stale_while_revalidate = stale_while_revalidate
+        self._quotes = {}
+        self._watched = set()
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._background = ThreadPoolExecutor(max_workers=1, thread_name_prefix='quotes')
+
+    def _refresh(self, symbols):
+        symbols = list(symbols)
+        quotes = {}
+        if self.shared is not None:
+            now = time.time()
+            quotes = {
+                symbol: (price, fetched_at) for symbol, (price, fetched_at) in self.shared.get_many(symbols).items()
+                if now - fetched_at < self.ttl
+            }
+        remaining = [symbol for symbol in symbols if symbol not in quotes]
+        if remaining:
+            try:
+                prices = self._fetch(remaining)
+            except Exception as e:
+                logger.warning(f'Quote refresh failed for {len(remaining)} symbols: {e}')
+                prices = {}
+            fetched_at = time.time()
+            if self.shared is not None:
+                self.shared.set_many(prices, fetched_at)
+            quotes.update((symbol, (price, fetched_at)) for symbol, price in prices.items())
+        with self._lock:
+            self._quotes.update(quotes)
+            self._refreshing.difference_update(symbols)
+        return {symbol: price for symbol, (price, _) in quotes.items()}
+
+    def _refresh_in_background(self):
+        now = time.time()
+        with self._lock:
+            expired = {
+                symbol for symbol in self._watched - self._refreshing
+                if now - self._quotes.get(symbol, (None, 0))[1] >= self.ttl
+            }
+            if not expired:
+                return
+            self._refreshing.update(expired)
+        self._background.submit(self._refresh, expired)
+
+    def get_quotes(self, symbols, stale_while_revalidate=None):
+        """Return `{symbol: price}` for every symbol a price is available for."""
+        if stale_while_revalidate is None:
+            stale_while_revalidate = self.stale_while_revalidate
+        now = time.time()
+        quotes, missing, stale = {}, [], False
+        with self._lock:
+            self._watched.update(symbols)
+            for symbol in symbols:
+                price, fetched_at = self._quotes.get(symbol, (None, 0))
+                age = now - fetched_at
+                if price is not None and age < self.ttl:
+                    quotes[symbol] = price
+                elif price is not None and stale_while_revalidate and age < self.max_stale:
+                    quotes[symbol] = price
+                    stale = True
+                else:
+                    missing.append(symbol)
+        if missing:
+            quotes.update(self._refresh(missing))
+        if stale:
+            self._refresh_in_background()
+        return quotes
+
+    def refresh_watched(self):
+        """Refresh every symbol requested so far in one batch."""
+        with self._lock:
+            symbols = set(self._watched)
+        return self._refresh(symbols) if symbols else {}
+
+
+_service = None
+
+
+def get_quote_service():
+    global _service
+    if _service is None:
+        _service = QuoteService(shared=get_shared_cache('quotes'))
+    return _service
+
+
+def get_quotes(symbols):
+    return get_quote_service().get_quotes(symbols)
@@ -1,63 +1,167 @@
-from flask import request, jsonify
-from stock_analysis import predict_stock
-from news_analysis import analyze_news_titles
-from db_operations import collection
-from utils import load_mappings
-import yfinance as yf
+import hashlib
+import os
+import threading
+import time
+from flask import request, jsonify, current_app, url_for
+from stock_analysis import predict_stock_shared, long_term_path
+from predictions import get_predictions, get_prediction
+from news_analysis import get_suggestions, get_news_metrics
+from db_operations import profiles
+from jobs import get_job_queue
+from singleflight import coalescing_stats
+from stock_data import get_stock_info, stock_history_payload, select_info, history_columns
+
+# How long materialized suggestion predictions are served before current prices are refreshed
+SUGGESTIONS_TTL = float(os.getenv('SUGGESTIONS_TTL', 900))
+BULK_STOCKS_LIMIT = int(os.getenv('BULK_STOCKS_LIMIT', 500))
+
+def with_failed_symbols(response, errors):
+    """List symbols that could not be predicted without changing the body shape."""
+    if errors:
+        response.headers['X-Failed-Symbols'] = ','.join(sorted(errors))
+    return response
+
+def split_param(value):
+    return [item.strip() for item in value.split(',') if item.strip()] if value else None
 
 def register_routes(app):
+    def run_prediction_job(job, stock_symbol, term):
+        result = {'prediction': predict_stock_shared(stock_symbol, term, on_stage=job.publish)}
+        if term == 'long_term' and not isinstance(result['prediction'], str):
+            # The whole forecast path; the fitted model is already in memory
+            result['path'] = history_columns(long_term_path(stock_symbol + '.NS').to_frame(), ['Date', 'Close'])
+        return result
+
     @app.route('/predict', methods=['POST'])
     def predict():
+        """Queue a prediction and return its job id; `?wait=1` answers synchronously.
+
+        Precomputed predictions are returned directly with status 200.
+        """
         data = request.json
         stock_symbol = data.get('stock_symbol')
         term = data.get('term')
-        prediction = predict_stock(stock_symbol, term)
-        return jsonify({'prediction': prediction})
+        if not stock_symbol or not term:
+            return jsonify({'error': 'Stock symbol or term not provided'}), 400
+        # Answer straight from the nightly precompute when it is fresh
+        precomputed = get_prediction(stock_symbol, term)
+        if precomputed is not None:
+            return jsonify({'prediction': precomputed, 'precomputed': True})
+        if request.args.get('wait', '').lower() in ['1', 'true']:
+            prediction = predict_stock_shared(stock_symbol, term)
+            return jsonify({'prediction': prediction})
+        job = get_job_queue().submit(('predict', stock_symbol, term), run_prediction_job, stock_symbol, term)
+        return jsonify({
+            'job_id': job.id,
+            'status': job.status,
+            'status_url': url_for('get_job', job_id=job.id),
+            'stream_url': url_for('stream_job', job_id=job.id)
+        }), 202
+
+    @app.route('/jobs/<string:job_id>', methods=['GET'])
+    def get_job(job_id):
+        job = get_job_queue().get(job_id)
+        if job is None:
+            return jsonify({'error': 'Job not found'}), 404
+        return jsonify(job.to_dict())
+
+    @app.route('/jobs/<string:job_id>/stream', methods=['GET'])
+    def stream_job(job_id):
+        """Server-sent events for a job's progress, ending with its result."""
+        job = get_job_queue().get(job_id)
+        if job is None:
+            return jsonify({'error': 'Job not found'}), 404
+
+        def events():
+            seen = 0
+            while True:
+                new_events = job.wait_for_events(seen, timeout=15)
+                if not new_events:
+                    if job.done:
+                        return
+                    yield ': keep-alive\n\n'
+                    continue
+                for event in new_events:
+                    yield f"event: {event['event']}\ndata: {app.json.dumps(event['data'])}\n\n"
+                seen += len(new_events)
+                if job.done and seen == len(job.events):
+                    return
+
+        return app.response_class(events(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
+    # Suggestion predictions materialized per news/mappings version
+    materialized = {'version': None, 'expires': 0.0, 'etag': None, 'body': None, 'errors': {}}
+    materialize_lock = threading.Lock()
+
+    def materialize_suggestions(mappings):
+        snapshot = mappings.snapshot()
+        version, suggestions = get_suggestions(snapshot.matcher, snapshot.mtime)
+        with materialize_lock:
+            if materialized['version'] == version and time.time() < materialized['expires']:
+                return materialized.copy()
+
+            # Fetch predictions for the suggested stocks in one batch
+            results, errors = get_predictions(suggestions.keys())
+            predictions = {}
+            for symbol, result in results.items():
+                predictions[symbol] = {
+                    'current_price': result['current_price'],
+                    'short_term': result['short_term'],
+                    'long_term': result['long_term'],
+                    'company_name': mappings.symbol_to_name(symbol),
+                    'details': suggestions[symbol]  # This includes the full title as reason to buy
+                }
+            created = time.time()
+            # Derived from the content, so every worker process tags the same body the same way
+            content = app.json.dumps([predictions, sorted(errors)], sort_keys=True)
+            materialized.update({
+                'version': version,
+                'expires': created + SUGGESTIONS_TTL,
+                'etag': hashlib.sha1(content.encode()).hexdigest()[:20],
+                'body': predictions,
+                'errors': errors,
+            })
+            return materialized.copy()
 
     @app.route('/predict_stocks', methods=['GET'])
     def predict_stocks():
         """Endpoint to predict and list stocks based on cached news analysis."""
-        # Load company to symbol mappings
-        mappings_csv_path = 'D:/New folder/stock-predictor/src/full_company_names.csv'
-        mappings = load_mappings(mappings_csv_path)
-
-        # Use cached news articles
-        from news_analysis import news_articles_cache
-        suggestions = analyze_news_titles(news_articles_cache, mappings)
-
-        # Fetch predictions for the suggested stocks
-        predictions = {}
-        for symbol in suggestions.keys():
-            stock_data = yf.Ticker(symbol + '.NS')
-            current_price = stock_data.history(period='1d')['Close'].iloc[-1] 
-            short_term_pred = predict_stock(symbol, 'short_term')
-            long_term_pred = predict_stock(symbol, 'long_term')
-            predictions[symbol] = {
-                'current_price': current_price,
-                'short_term': short_term_pred,
-                'long_term': long_term_pred,
-                'details': suggestions[symbol]  # This includes the full title as reason to buy
-            }
-
-        # Return predictions as JSON
-        return jsonify(predictions)
+        # Company to symbol mappings loaded at startup
+        entry = materialize_suggestions(current_app.extensions['mappings'])
+
+        # Let clients skip re-downloading an unchanged payload
+        if request.if_none_match.contains(entry['etag']):
+            response = app.response_class(status=304)
+        else:
+            response = with_failed_symbols(jsonify(entry['body']), entry['errors'])
+        response.set_etag(entry['etag'])
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+
+    @app.route('/api/news/status', methods=['GET'])
+    def news_status():
+        """Freshness and failure counters of the background news refresher."""
+        return jsonify(get_news_metrics())
+
+    @app.route('/api/coalescing', methods=['GET'])
+    def coalescing():
+        """How many calls each single-flight group saved by sharing a computation."""
+        return jsonify(coalescing_stats())
 
     @app.route('/submit-form', methods=['POST'])
     def submit_form():
         data = request.json
         if not data:
             return jsonify({'error': 'No data provided'}), 400
-        email = data.get('email')
-        existing_user = collection.find_one({'email': email})
-        if existing_user:
+        data['stocks'] = []
+        # The unique email index rejects a second registration
+        if profiles.create(data):
+            return jsonify({'message': 'Data stored successfully'}), 200
+        elif profiles.exists(data.get('email')):
             return jsonify({
                 'error': 'User already registered\nPlease Login',
                 'redirect_url': '/login'
             }), 200
-        data['stocks'] = []
-        result = collection.insert_one(data)
-        if result.acknowledged:
-            return jsonify({'message': 'Data stored successfully'}), 200
         else:
             return jsonify({'error': 'Failed to store data'}), 500
 
@@ -66,7 +170,7 @@ def register_routes(app):
         data = request.json
         email = data.get('email')
         password = data.get('password')
-        user = collection.find_one({'email': email})
+        user = profiles.get_login(email)
         if user:
             hashed_password = user['password']
             if password == hashed_password:
@@ -83,48 +187,59 @@ def register_routes(app):
 
     @app.route('/api/stock/<string:symbol>', methods=['GET'])
     def get_stock_data(symbol):
+        """Company info and price history as column arrays.
+
+        Optional query parameters: `start`/`end` (YYYY-MM-DD), `fields`
+        (history columns), `info_fields`, `points` (downsample target) and
+        `downsample` (`lttb` or `ohlc`).
+        """
+        fields = split_param(request.args.get('fields'))
+        info_fields = split_param(request.args.get('info_fields'))
+        points = request.args.get('points', type=int)
         try:
-            stock = yf.Ticker(symbol + '.NS')
-            stock_info = stock.info
+            stock_info = get_stock_info(symbol)
             if not stock_info:
                 return jsonify({'error': 'No stock information available'}), 404
-            stock_history = stock.history(period="1y")
-            if stock_history.empty:
-                return jsonify({'error': 'No historical data available'}), 404
-            stock_history = stock_history.reset_index().to_dict(orient='records')
-            return jsonify({
-                'stock_info': stock_info,
-                'stock_history': stock_history
-            })
+            stock_history = stock_history_payload(
+                symbol,
+                start=request.args.get('start'),
+                end=request.args.get('end'),
+                fields=fields,
+                points=points,
+                method=request.args.get('downsample', 'lttb')
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         except Exception as e:
             return jsonify({'error': str(e)}), 500
+        if not next(iter(stock_history.values()), None):
+            return jsonify({'error': 'No historical data available'}), 404
+        return jsonify({
+            'stock_info': select_info(stock_info, info_fields),
+            'stock_history': stock_history
+        })
 
     @app.route('/user-portfolio', methods=['GET'])
     def get_user_portfolio():
         email = request.args.get('email')
         if not email:
             return jsonify({'error': 'Email not provided'}), 400
-        user = collection.find_one({'email': email})
-        if not user:
+        stocks = profiles.get_stocks(email)
+        if stocks is None:
             return jsonify({'error': 'User not found'}), 404
-        stocks = user.get('stocks', [])
+        results, errors = get_predictions(stocks)
         portfolio = []
         for symbol in stocks:
-            try:
-                stock_data = yf.Ticker(symbol + '.NS')
-                current_price = stock_data.history(period='1d')['Close'].iloc[-1]
-                short_term_pred = predict_stock(symbol, 'short_term')
-                long_term_pred = predict_stock(symbol, 'long_term')
-                portfolio.append({
-                    'name': symbol,
-                    'currentPrice': current_price,
-                    'predictedShortTermPrice': short_term_pred,
-                    'predictedLongTermPrice': long_term_pred
-                })
-            except Exception as e:
-                print(f"Error fetching data for {symbol}: {e}")
+            if symbol not in results:
                 continue
-        return jsonify(portfolio)
+            result = results[symbol]
+            portfolio.append({
+                'name': symbol,
+                'currentPrice': result['current_price'],
+                'predictedShortTermPrice': result['short_term'],
+                'predictedLongTermPrice': result['long_term']
+            })
+        return with_failed_symbols(jsonify(portfolio), errors)
 
     @app.route('/add-stock', methods=['POST'])
     def add_stock():
@@ -133,14 +248,10 @@ def register_routes(app):
         stock_symbol = data.get('stock_symbol')
         if not email or not stock_symbol:
             return jsonify({'error': 'Email or stock symbol not provided'}), 400
-        user = collection.find_one({'email': email})
-        if not user:
+        result = profiles.add_stock(email, stock_symbol)
+        if result.matched_count == 0:
             return jsonify({'error': 'User not found'}), 404
-        if stock_symbol not in user.get('stocks', []):
-            collection.update_one(
-                {'email': email},
-                {'$push': {'stocks': stock_symbol}}
-            )
+        if result.modified_count > 0:
             return jsonify({'message': 'Stock added to portfolio'}), 200
         else:
             return jsonify({'message': 'Stock already in portfolio'}), 200
@@ -152,17 +263,33 @@ def register_routes(app):
         stock_symbol = data.get('stock_symbol')
         if not email or not stock_symbol:
             return jsonify({'error': 'Email or stock symbol not provided'}), 400
-        user = collection.find_one({'email': email})
-        if not user:
+        result = profiles.remove_stock(email, stock_symbol)
+        if result.modified_count > 0:
+            return jsonify({'message': 'Stock removed from portfolio'}), 200
+        # Only look the user up to explain why nothing was removed
+        if not profiles.exists(email):
             return jsonify({'error': 'User not found'}), 404
-        if stock_symbol in user.get('stocks', []):
-            result = collection.update_one(
-                {'email': email},
-                {'$pull': {'stocks': stock_symbol}}
-            )
-            if result.acknowledged and result.modified_count > 0:
-                return jsonify({'message': 'Stock removed from portfolio'}), 200
-            else:
-                return jsonify({'error': 'Failed to remove stock'}), 500
-        else:
-            return jsonify({'error': 'Stock not found in portfolio'}), 404
+        return jsonify({'error': 'Stock not found in portfolio'}), 404
+
+    @app.route('/bulk-stocks', methods=['POST'])
+    def bulk_stocks():
+        """Add and remove many symbols at once: `{"email", "add": [...], "remove": [...]}`."""
+        data = request.json or {}
+        email = data.get('email')
+        add = data.get('add', [])
+        remove = data.get('remove', [])
+        if not email:
+            return jsonify({'error': 'Email not provided'}), 400
+        if not all(isinstance(symbols, list) and all(isinstance(s, str) and s for s in symbols) for symbols in (add, remove)):
+            return jsonify({'error': 'add and remove must be lists of stock symbols'}), 400
+        if len(add) + len(remove) > BULK_STOCKS_LIMIT:
+            return jsonify({'error': f'At most {BULK_STOCKS_LIMIT} symbols per request'}), 400
+        result = profiles.update_stocks(email, add, remove)
+        stocks = profiles.get_stocks(email)
+        if stocks is None:
+            return jsonify({'error': 'User not found'}), 404
+        return jsonify({
+            'message': 'Portfolio updated',
+            'modified': result.modified_count if result else 0,
+            'stocks': stocks
+        }), 200
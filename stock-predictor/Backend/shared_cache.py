@@ -0,0 +1,110 @@
+"""Key/value cache in a local SQLite file shared by every worker process.
+
+Under a multi-process server each worker would otherwise warm its own copy
+of the quote and prediction caches. Entries are JSON values stored with the
+time they were written; readers decide how old is too old. The cache is
+off unless SHARED_CACHE_PATH is set.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SHARED_CACHE_PATH = os.getenv('SHARED_CACHE_PATH')
+# Entries older than this are deleted
+SHARED_CACHE_RETENTION = float(os.getenv('SHARED_CACHE_RETENTION', 2 * 24 * 3600))
+PURGE_INTERVAL = 60
+
+
+def _json_default(value):
+    # NumPy scalars and arrays from the model code
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+class SharedCache:
+    def __init__(self, path, namespace, retention=SHARED_CACHE_RETENTION):
+        self.path = path
+        self.namespace = namespace
+        self.retention = retention
+        self._local = threading.local()
+        self._last_purge = 0.0
+
+    def _connection(self):
+        # sqlite3 connections must not cross threads or forks
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS cache ('
+                'namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, stored_at REAL NOT NULL, '
+                'PRIMARY KEY (namespace, key)) WITHOUT ROWID'
+            )
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def get_many(self, keys):
+        """Return `{key: (value, stored_at)}` for the keys that are present."""
+        keys = [str(key) for key in keys]
+        if not keys:
+            return {}
+        try:
+            rows = self._connection().execute(
+                f"SELECT key, value, stored_at FROM cache WHERE namespace = ? AND key IN ({','.join('?' * len(keys))})",
+                [self.namespace, *keys]
+            ).fetchall()
+        except sqlite3.Error as e:
+            logger.warning(f'Shared cache read failed: {e}')
+            return {}
+        return {key: (json.loads(value), stored_at) for key, value, stored_at in rows}
+
+    def get(self, key, max_age=None):
+        entry = self.get_many([key]).get(str(key))
+        if entry is None or (max_age is not None and time.time() - entry[1] >= max_age):
+            return None
+        return entry[0]
+
+    def set_many(self, items, stored_at=None):
+        """Store `{key: value}`; values must be JSON serializable."""
+        stored_at = stored_at or time.time()
+        rows = [(self.namespace, str(key), json.dumps(value, default=_json_default), stored_at) for key, value in items.items()]
+        if not rows:
+            return
+        try:
+            connection = self._connection()
+            connection.executemany('INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)', rows)
+            if stored_at - self._last_purge > PURGE_INTERVAL:
+                self._last_purge = stored_at
+                connection.execute('DELETE FROM cache WHERE namespace = ? AND stored_at < ?',
+                                   (self.namespace, stored_at - self.retention))
+        except sqlite3.Error as e:
+            logger.warning(f'Shared cache write failed: {e}')
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_shared_cache(namespace):
+    """The shared cache for `namespace`, or None when SHARED_CACHE_PATH is unset."""
+    if not SHARED_CACHE_PATH:
+        return None
+    with _caches_lock:
+        if namespace not in _caches:
+            _caches[namespace] = SharedCache(SHARED_CACHE_PATH, namespace)
+        return _caches[namespace]
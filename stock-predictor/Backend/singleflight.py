@@ -0,0 +1,81 @@
+"""Request coalescing: concurrent callers with the same key share one computation."""
+import threading
+from concurrent.futures import Future
+
+_groups = {}
+_groups_lock = threading.Lock()
+
+
+class SingleFlight:
+    """Deduplicates in-flight work by key.
+
+    While a call for a key is running, later callers with the same key wait
+    for it and receive its result (or exception) instead of starting their
+    own. Counters record how many calls were saved this way.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.executions = 0
+        self.shared = 0
+
+    def share(self, key, start):
+        """Return the in-flight future for `key`, or the one `start()` creates."""
+        with self._lock:
+            self.calls += 1
+            future = self._calls.get(key)
+            if future is not None:
+                self.shared += 1
+                return future
+            self.executions += 1
+            future = start()
+            self._calls[key] = future
+        future.add_done_callback(lambda _: self._forget(key, future))
+        return future
+
+    def _forget(self, key, future):
+        with self._lock:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+
+    def do(self, key, func, *args, **kwargs):
+        """Run `func` once for all concurrent callers using the same key."""
+        leader = []
+
+        def start():
+            leader.append(Future())
+            return leader[0]
+
+        future = self.share(key, start)
+        if leader and leader[0] is future:
+            try:
+                future.set_result(func(*args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+        return future.result()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'executions': self.executions,
+                'shared': self.shared,
+                'in_flight': len(self._calls),
+            }
+
+
+def get_group(name):
+    """Process-wide SingleFlight instance for `name`."""
+    with _groups_lock:
+        if name not in _groups:
+            _groups[name] = SingleFlight(name)
+        return _groups[name]
+
+
+def coalescing_stats():
+    with _groups_lock:
+        groups = list(_groups.values())
+    return {group.name: group.stats() for group in groups}
@@ -1,131 +1,132 @@
-import yfinance as yf
-import numpy as np
+import logging
 import pandas as pd
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.metrics import mean_absolute_percentage_error
-from statsmodels.tsa.arima.model import ARIMA
-import ta
-from datetime import datetime
-import matplotlib.pyplot as plt
-
-def calculate_indicators(data):
-    # Adding specified indicators
-    data['SMA_30'] = ta.trend.sma_indicator(data['Close'], window=30)
-    data['SMA_100'] = ta.trend.sma_indicator(data['Close'], window=100)
-    data['EMA_20'] = ta.trend.ema_indicator(data['Close'], window=20)
-    data['EMA_50'] = ta.trend.ema_indicator(data['Close'], window=50)
-    data['RSI'] = ta.momentum.RSIIndicator(data['Close']).rsi()
-    
-    # MACD
-    data['MACD'] = ta.trend.macd(data['Close'])
-    data['MACD Signal'] = ta.trend.macd_signal(data['Close'])
-    data['MACD Histogram'] = ta.trend.macd_diff(data['Close'])
-    
-    # Bollinger Bands
-    data['Bollinger High'] = ta.volatility.bollinger_hband(data['Close'])
-    data['Bollinger Low'] = ta.volatility.bollinger_lband(data['Close'])
-
-    # Average True Range (ATR)
-    data['ATR'] = ta.volatility.average_true_range(data['High'], data['Low'], data['Close'])
-    
-    # Fibonacci Levels
-    high_price = data['Close'].max()
-    low_price = data['Close'].min()
-    diff = high_price - low_price
-    data['Fibonacci Level 0.0'] = high_price
-    data['Fibonacci Level 0.236'] = high_price - (0.236 * diff)
-    data['Fibonacci Level 0.382'] = high_price - (0.382 * diff)
-    data['Fibonacci Level 0.618'] = high_price - (0.618 * diff)
-    data['Fibonacci Level 1.0'] = low_price
-    
-    # Stochastic Oscillator
-    data['Stochastic Oscillator'] = ta.momentum.stoch(data['High'], data['Low'], data['Close'])
-    
-    # On-Balance Volume (OBV)
-    data['OBV'] = ta.volume.OnBalanceVolumeIndicator(data['Close'], data['Volume']).on_balance_volume()
-    
-    # Chaikin Money Flow (CMF)
-    data['CMF'] = ta.volume.ChaikinMoneyFlowIndicator(data['High'], data['Low'], data['Close'], data['Volume']).chaikin_money_flow()
-
-    # Aroon Indicator
-    data['Aroon Up'] = ta.trend.aroon_up(data['High'], data['Low'], window=25)
-    data['Aroon Down'] = ta.trend.aroon_down(data['High'], data['Low'], window=25)
-
+import os
+from price_store import get_price_history, on_rewrite
+from model_cache import model_cache, feature_set_id
+from indicators import compute_indicators
+from streaming_indicators import get_indicator_store, STREAMING_COLUMNS
+from feature_profiles import load_profile
+from singleflight import get_group
+from shared_cache import get_shared_cache
+from metrics import span
+from long_term import get_forecaster, LONG_TERM_HORIZON
+
+logger = logging.getLogger(__name__)
+
+# Columns of the active feature profile (FEATURE_PROFILE, 'default' unless configured)
+FEATURE_COLUMNS = load_profile()
+PRICE_TARGETS = ['Close', 'Low', 'High', 'Open']
+
+# Forest size and parallelism for the short-term model
+FOREST_TREES = int(os.getenv('FOREST_TREES', 100))
+FOREST_N_JOBS = int(os.getenv('FOREST_N_JOBS', 1))
+
+def discard_derived_state(symbol):
+    # Indicators, models and ARIMA fits built from a price history that was revised upstream
+    get_indicator_store().discard(symbol)
+    model_cache.discard(symbol)
+    get_forecaster().discard(symbol)
+
+on_rewrite(discard_derived_state)
+
+def calculate_indicators(data, columns=None):
+    # Only the active profile's features, computed in one vectorized pass
+    if columns is None:
+        columns = FEATURE_COLUMNS
+    indicators = compute_indicators(data, columns)
+    data = pd.concat([data.drop(columns=indicators.columns, errors='ignore'), indicators], axis=1)
     data = data.dropna()  # Drop rows with NaN values after calculating indicators
     return data
 
-def predict_prices(data, target):
+def fit_forest(X, y, n_estimators=100, n_jobs=None, symbol=None):
+    """Fit a RandomForestRegressor, reusing a cached one for the same symbol and last bar."""
+    def fit():
+        from sklearn.ensemble import RandomForestRegressor  # Deferred: slow to import
+        with span('forest_fit'):
+            model = RandomForestRegressor(n_estimators=n_estimators, random_state=42, n_jobs=n_jobs)
+            model.fit(X[:-1], y[:-1])  # Train on all but the last row
+        return model
+
+    if symbol is None:
+        return fit()
+    target = '+'.join(y.columns) if y.ndim > 1 else y.name
+    key = (symbol, target, feature_set_id(f'rf{n_estimators}', X.columns), X.index[-1])
+    return model_cache.get_or_fit(key, fit)
+
+def predict_prices(data, target, symbol=None):
     # Check if there's enough data
     if len(data) < 2:
-        print("Not enough data to make predictions.")
+        logger.warning('Not enough data to make predictions.')
         return None
 
     # Calculate features
-    X = data[['SMA_30', 'SMA_100', 'EMA_20', 'EMA_50', 
-              'RSI', 'MACD', 'MACD Signal', 'MACD Histogram', 
-              'Bollinger High', 'Bollinger Low', 'ATR', 
-              'Stochastic Oscillator', 'OBV', 'CMF', 
-              'Aroon Up', 'Aroon Down']]
-    
+    X = data[FEATURE_COLUMNS]
     y = data[target]
 
-    model = RandomForestRegressor(n_estimators=100, random_state=42)
-    model.fit(X[:-1], y[:-1])  # Train on all but the last row
+    model = fit_forest(X, y, symbol=symbol)
     # Predict tomorrow's price using the last row of features
     tomorrow_features = X.iloc[[-1]]  # Use the last row for tomorrow's prediction
     predicted_price_tomorrow = model.predict(tomorrow_features)[0]
 
     return predicted_price_tomorrow
 
-def short_term_analysis(data, stock_symbol):
-    data = calculate_indicators(data)
+def predict_prices_joint(data, targets=PRICE_TARGETS, n_estimators=FOREST_TREES, n_jobs=FOREST_N_JOBS, symbol=None):
+    """Predict several target columns with one multi-output forest.
+
+    The trees are grown once on the shared feature matrix instead of once per
+    target, and every leaf stores the mean of all targets together.
+    """
+    if len(data) < 2:
+        logger.warning('Not enough data to make predictions.')
+        return None
+
+    X = data[FEATURE_COLUMNS]
+    y = data[targets]
+
+    model = fit_forest(X, y, n_estimators=n_estimators, n_jobs=n_jobs, symbol=symbol)
+    with span('forest_predict'):
+        predicted = model.predict(X.iloc[[-1]])[0]
+    return dict(zip(targets, predicted))
+
+def short_term_analysis(data, stock_symbol, n_estimators=FOREST_TREES, n_jobs=FOREST_N_JOBS, incremental=True):
+    with span('indicators'):
+        if incremental and set(FEATURE_COLUMNS) <= set(STREAMING_COLUMNS):
+            # Only bars added since the last call go through the indicator state
+            data = data.join(get_indicator_store().features(stock_symbol, data)[FEATURE_COLUMNS])
+        else:
+            data = calculate_indicators(data)
     data = data.dropna()
 
-    predicted_close = predict_prices(data, 'Close')
-    predicted_low = predict_prices(data, 'Low')
-    predicted_high = predict_prices(data, 'High')
-    predicted_open = predict_prices(data, 'Open')
-    
-    print(f"Predicted Close Price (Tomorrow): {predicted_close:.2f}")
-    print(f"Predicted Low Price (Tomorrow): {predicted_low:.2f}")
-    print(f"Predicted High Price (Tomorrow): {predicted_high:.2f}")
-    print(f"Predicted Open Price (Tomorrow): {predicted_open:.2f}")
-    
-    # Calculate percentage change for predicted low and high based on today's close
-    actual_close_today = data['Close'].iloc[-1]
-    percent_change_low = ((predicted_low - actual_close_today) / actual_close_today) * 100
-    percent_change_high = ((predicted_high - actual_close_today) / actual_close_today) * 100
-    
-    print(f"Percentage Change in Low Price: {percent_change_low:.2f}%")
-    print(f"Percentage Change in High Price: {percent_change_high:.2f}%")
+    predicted = predict_prices_joint(data, PRICE_TARGETS, n_estimators=n_estimators, n_jobs=n_jobs,
+                                     symbol=stock_symbol)
+    predicted_close = predicted['Close']
+    predicted_low = predicted['Low']
+    predicted_high = predicted['High']
+    predicted_open = predicted['Open']
+    logger.debug(f'{stock_symbol} tomorrow: close {predicted_close:.2f}, low {predicted_low:.2f}, '
+                 f'high {predicted_high:.2f}, open {predicted_open:.2f}')
 
     return predicted_close, predicted_low, predicted_high, predicted_open
 
-def long_term_analysis(ticker):
-    data = yf.download(ticker, period='5y')
-    data['Price'] = data['Close']
-    data.index = pd.to_datetime(data.index)
-    data['Price_diff'] = data['Price'].diff().dropna()
-    model = ARIMA(data['Price_diff'].dropna(), order=(5, 1, 0))
-    model_fit = model.fit()
-    forecast = model_fit.forecast(steps=30)
-    last_price = data['Price'].iloc[-1]
-    predicted_prices = last_price + forecast.cumsum()
-    return predicted_prices.iloc[-1]
-
-def predict_stock(stock_symbol, term):
+def long_term_path(ticker, data=None, steps=LONG_TERM_HORIZON):
+    """Forecast closing prices for the next `steps` business days."""
+    if data is None:
+        data = get_price_history(ticker)
+    return get_forecaster().forecast(ticker, data, steps)
+
+def long_term_analysis(ticker, data=None):
+    # Price at the end of the forecast horizon
+    return long_term_path(ticker, data).iloc[-1]
+
+def predict_stock(stock_symbol, term, on_stage=None):
+    """Predict prices for an NSE symbol; `on_stage(name, data)` is told about progress."""
     stock_symbol = stock_symbol + '.NS'
     try:
-        # Fetch historical data to find the first trading date
-        historical_data = yf.download(stock_symbol, period='max')
-        
-        # Get the first date of the stock's historical data
-        start_date = historical_data.index.min().strftime('%Y-%m-%d')
-        
-        end_date = datetime.today().strftime('%Y-%m-%d')
-        
-        # Fetch the data for the specified date range
-        data = yf.download(stock_symbol, start=start_date, end=end_date)
+        # Full daily history from the local store; only new bars hit the network
+        with span('price_history'):
+            data = get_price_history(stock_symbol)
+        if on_stage is not None:
+            on_stage('data_loaded', {'rows': len(data), 'last_bar': str(data.index[-1].date()) if len(data) else None})
 
         if len(data) < 2:
             return "Insufficient data"
@@ -134,15 +135,55 @@ def predict_stock(stock_symbol, term):
             predicted_close, predicted_low, predicted_high, predicted_open = short_term_analysis(data, stock_symbol)
             return predicted_close, predicted_low, predicted_high, predicted_open
         elif term == 'long_term':
-            prediction = long_term_analysis(stock_symbol)
+            prediction = long_term_analysis(stock_symbol, data)
             return prediction
         else:
             return "Invalid term specified"
     except Exception as e:
-        print(f"Error: {str(e)}")
+        logger.warning(f'Prediction failed for {stock_symbol}: {e}')
         return str(e)
 
+def predict_stock_shared(stock_symbol, term, on_stage=None):
+    """predict_stock, with concurrent calls for the same symbol, term and last bar sharing one run.
+
+    With a shared cache configured, the day's result is also reused by the
+    other worker processes; a reused result has the same shape as a computed
+    one, and its recorded stage events are replayed to `on_stage`.
+    """
+    # Keyed on the data, not the calendar day, so a result computed while a
+    # download was failing is not served once the new bar is stored
+    with span('price_history'):
+        data = get_price_history(stock_symbol + '.NS')
+    key = (stock_symbol, term, str(data.index[-1].date()) if len(data) else '')
+    shared = get_shared_cache('predictions')
+    if shared is not None:
+        cached = shared.get(':'.join(key))
+        # Entries written before stage events were recorded hold the bare prediction
+        if isinstance(cached, dict):
+            if on_stage is not None:
+                for name, data in cached['stages']:
+                    on_stage(name, data)
+            prediction = cached['prediction']
+            return tuple(prediction) if isinstance(prediction, list) else prediction
+    return get_group('predict_stock').do(key, _predict_and_share, stock_symbol, term, on_stage, shared, ':'.join(key))
+
+def _predict_and_share(stock_symbol, term, on_stage, shared, shared_key):
+    stages = []
+
+    def record(name, data):
+        stages.append([name, data])
+        if on_stage is not None:
+            on_stage(name, data)
+
+    prediction = predict_stock(stock_symbol, term, on_stage=record)
+    # Error messages are returned as strings and are not worth sharing
+    if shared is not None and not isinstance(prediction, str):
+        value = [float(price) for price in prediction] if isinstance(prediction, tuple) else float(prediction)
+        shared.set_many({shared_key: {'prediction': value, 'stages': stages}})
+    return prediction
+
 def calculate_accuracy_on_specific_date(model, X, y, target, data, specific_date):
+    from sklearn.metrics import mean_absolute_percentage_error
     # Convert specific_date to datetime object
     specific_date = pd.to_datetime(specific_date)
 
@@ -155,7 +196,7 @@ def calculate_accuracy_on_specific_date(model, X, y, target, data, specific_date
 
         # Calculate accuracy
         accuracy = 100 - mean_absolute_percentage_error([actual_price], [predicted_price]) * 100
-        print(f"Actual {target} Price on {specific_date.strftime('%Y-%m-%d')}: {actual_price:.2f}, Predicted: {predicted_price:.2f}")
-        print(f"Model Accuracy for {target} on {specific_date.strftime('%Y-%m-%d')}: {accuracy:.2f}%")
+        logger.info(f"Actual {target} Price on {specific_date.strftime('%Y-%m-%d')}: {actual_price:.2f}, Predicted: {predicted_price:.2f}")
+        logger.info(f"Model Accuracy for {target} on {specific_date.strftime('%Y-%m-%d')}: {accuracy:.2f}%")
     else:
-        print(f"Date {specific_date.strftime('%Y-%m-%d')} is not available in the data.")
+        logger.info(f"Date {specific_date.strftime('%Y-%m-%d')} is not available in the data.")
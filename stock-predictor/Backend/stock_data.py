@@ -0,0 +1,167 @@
+"""Cached company info and price history for the stock detail endpoint."""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from price_store import get_price_history
+from singleflight import get_group
+
+logger = logging.getLogger(__name__)
+
+STOCK_INFO_TTL = float(os.getenv('STOCK_INFO_TTL', 6 * 3600))
+STOCK_HISTORY_TTL = float(os.getenv('STOCK_HISTORY_TTL', 900))
+# Symbols kept per cache; the least recently used one is dropped beyond this
+STOCK_INFO_CACHE_SIZE = int(os.getenv('STOCK_INFO_CACHE_SIZE', 512))
+STOCK_HISTORY_CACHE_SIZE = int(os.getenv('STOCK_HISTORY_CACHE_SIZE', 64))
+# Range returned when the request does not give a start date
+DEFAULT_HISTORY_DAYS = int(os.getenv('DEFAULT_HISTORY_DAYS', 365))
+HISTORY_FIELDS = ['Date', 'Open', 'High', 'Low', 'Close', 'Volume']
+
+
+class TTLCache:
+    """Values per key that expire `ttl` seconds after they were loaded.
+
+    At most `maxsize` keys are kept; expired entries are dropped when they
+    are next looked up, and the least recently used key makes room for a
+    new one.
+    """
+
+    def __init__(self, ttl, maxsize=128):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, load):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if now < entry[1]:
+                    self._entries.move_to_end(key)
+                    return entry[0]
+                del self._entries[key]
+        value = load()
+        with self._lock:
+            self._entries[key] = (value, time.time() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_info_cache = TTLCache(STOCK_INFO_TTL, STOCK_INFO_CACHE_SIZE)
+_history_cache = TTLCache(STOCK_HISTORY_TTL, STOCK_HISTORY_CACHE_SIZE)
+
+
+def _fetch_info(symbol):
+    import yfinance as yf  # Deferred: slow to import
+    return yf.Ticker(symbol + '.NS').info
+
+
+def get_stock_info(symbol):
+    """Yahoo Finance company info for an NSE symbol."""
+    return _info_cache.get(symbol, lambda: get_group('stock_info').do(symbol, _fetch_info, symbol))
+
+
+def get_stock_history(symbol):
+    """Full daily OHLCV history for an NSE symbol from the price store."""
+    return _history_cache.get(symbol, lambda: get_group('stock_history').do(
+        symbol, get_price_history, symbol + '.NS'))
+
+
+def lttb_indices(values, threshold):
+    """Row positions kept by Largest-Triangle-Three-Buckets downsampling."""
+    n = len(values)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    y = np.asarray(values, dtype=float)
+    x = np.arange(n, dtype=float)
+    # Bucket edges for the points between the fixed first and last ones
+    edges = (np.arange(threshold - 1) * ((n - 2) / (threshold - 2))).astype(int) + 1
+    edges = np.append(edges, n)
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_start, next_end = edges[i + 1], edges[i + 2]
+        avg_x, avg_y = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        indices[i + 1] = a
+    return indices
+
+
+def ohlc_buckets(data, points):
+    """Merge consecutive bars into at most `points` OHLCV bars."""
+    if points >= len(data) or points < 1:
+        return data
+    bucket = np.arange(len(data)) * points // len(data)
+    grouped = data.groupby(bucket)
+    merged = pd.DataFrame({
+        'Open': grouped['Open'].first(),
+        'High': grouped['High'].max(),
+        'Low': grouped['Low'].min(),
+        'Close': grouped['Close'].last(),
+        'Volume': grouped['Volume'].sum(),
+    })
+    merged.index = pd.DatetimeIndex([data.index[positions[0]] for positions in grouped.indices.values()], name='Date')
+    return merged
+
+
+def downsample(data, points, method='lttb', column='Close'):
+    if method == 'ohlc':
+        return ohlc_buckets(data, points)
+    if method != 'lttb':
+        raise ValueError(f'Unknown downsampling method: {method}')
+    return data.iloc[lttb_indices(data[column].to_numpy(), points)]
+
+
+def history_columns(data, fields=None):
+    """Column-oriented history: one list per field, dates as ISO strings."""
+    fields = fields or HISTORY_FIELDS
+    unknown = [field for field in fields if field not in HISTORY_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown history fields: {', '.join(unknown)}")
+    columns = {}
+    for field in fields:
+        if field == 'Date':
+            columns['Date'] = data.index.strftime('%Y-%m-%d').tolist()
+        else:
+            columns[field] = data[field].tolist()
+    return columns
+
+
+def stock_history_payload(symbol, start=None, end=None, fields=None, points=None, method='lttb'):
+    """History for the requested range, optionally downsampled, as column arrays.
+
+    LTTB keeps the rows that best preserve the shape of the first requested
+    price field; OHLC bucketing merges consecutive bars instead.
+    """
+    data = get_stock_history(symbol)
+    if start is None:
+        start = (pd.Timestamp.today().normalize() - timedelta(days=DEFAULT_HISTORY_DAYS)).strftime('%Y-%m-%d')
+    data = data[data.index >= pd.Timestamp(start)]
+    if end is not None:
+        data = data[data.index <= pd.Timestamp(end)]
+    if points:
+        price_fields = [field for field in (fields or []) if field not in ('Date', 'Volume')]
+        data = downsample(data, points, method, price_fields[0] if price_fields else 'Close')
+    return history_columns(data, fields)
+
+
+def select_info(info, fields=None):
+    if not fields:
+        return info
+    return {field: info.get(field) for field in fields}
@@ -0,0 +1,393 @@
+"""Incremental versions of the model's feature indicators.
+
+`IndicatorState` holds just enough running state (EMAs, rolling windows,
+cumulative sums) to turn each new daily bar into a feature row without
+revisiting older bars. `IndicatorStore` keeps that state together with
+the feature rows already produced, per symbol, so a refresh after a new bar
+only processes and stores the bars that arrived since the last call.
+"""
+import logging
+import math
+import os
+import pickle
+import threading
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from atomic_files import atomic_write, file_lock
+
+logger = logging.getLogger(__name__)
+
+STREAMING_COLUMNS = ['SMA_30', 'SMA_100', 'EMA_20', 'EMA_50',
+                     'RSI', 'MACD', 'MACD Signal', 'MACD Histogram',
+                     'Bollinger High', 'Bollinger Low', 'ATR',
+                     'Stochastic Oscillator', 'OBV', 'CMF',
+                     'Aroon Up', 'Aroon Down']
+DEFAULT_STATE_DIR = os.getenv(
+    'INDICATOR_STATE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'indicator_state')
+)
+# Symbols whose indicator state is kept in memory
+INDICATOR_CACHE_SIZE = int(os.getenv('INDICATOR_CACHE_SIZE', 64))
+NAN = float('nan')
+FEATURE_DTYPE = np.dtype([('Date', 'datetime64[ns]')] + [(column, 'f8') for column in STREAMING_COLUMNS])
+
+
+class EMAState:
+    """Exponential moving average with pandas `adjust=False` semantics."""
+
+    def __init__(self, alpha, min_periods):
+        self.alpha = alpha
+        self.min_periods = min_periods
+        self.value = None
+        self.count = 0
+
+    @classmethod
+    def from_span(cls, span):
+        return cls(2 / (span + 1), span)
+
+    def update(self, x):
+        if self.value is None:
+            self.value = x
+        else:
+            self.value = self.alpha * x + (1 - self.alpha) * self.value
+        self.count += 1
+        return self.value if self.count >= self.min_periods else NAN
+
+
+class RollingWindow:
+    """Fixed-size window with a running sum and monotonic max/min queues."""
+
+    def __init__(self, window):
+        self.window = window
+        self.values = deque(maxlen=window)
+        self.total = 0.0
+        self.position = 0
+        self._max = deque()  # (position, value), values decreasing
+        self._min = deque()  # (position, value), values increasing
+
+    def update(self, x):
+        if len(self.values) == self.window:
+            self.total -= self.values[0]
+        self.values.append(x)
+        self.total += x
+        # Keep the earliest of equal values at the front, as argmax/argmin do
+        while self._max and self._max[-1][1] < x:
+            self._max.pop()
+        self._max.append((self.position, x))
+        while self._min and self._min[-1][1] > x:
+            self._min.pop()
+        self._min.append((self.position, x))
+        oldest = self.position - self.window + 1
+        while self._max[0][0] < oldest:
+            self._max.popleft()
+        while self._min[0][0] < oldest:
+            self._min.popleft()
+        self.position += 1
+
+    @property
+    def full(self):
+        return len(self.values) == self.window
+
+    def mean(self):
+        return self.total / self.window if self.full else NAN
+
+    def sum(self):
+        return self.total if self.full else NAN
+
+    def std(self):
+        # Recomputed from the window values so rounding error cannot accumulate
+        return float(np.std(self.values)) if self.full else NAN
+
+    def max(self):
+        return self._max[0][1] if self.full else NAN
+
+    def min(self):
+        return self._min[0][1] if self.full else NAN
+
+    def bars_since_max(self):
+        return self.position - 1 - self._max[0][0]
+
+    def bars_since_min(self):
+        return self.position - 1 - self._min[0][0]
+
+
+class WilderATRState:
+    """Average true range seeded with the mean of the first `window` ranges."""
+
+    def __init__(self, window=14):
+        self.window = window
+        self.seed = []
+        self.value = 0.0
+
+    def update(self, true_range):
+        if len(self.seed) < self.window:
+            self.seed.append(true_range)
+            if len(self.seed) == self.window:
+                self.value = sum(self.seed) / self.window
+            return self.value
+        self.value = (self.value * (self.window - 1) + true_range) / self.window
+        return self.value
+
+
+class RSIState:
+    def __init__(self, window=14):
+        self.up = EMAState(1 / window, window)
+        self.down = EMAState(1 / window, window)
+
+    def update(self, diff):
+        ema_up = self.up.update(diff if diff > 0 else 0.0)
+        ema_down = self.down.update(-diff if diff < 0 else 0.0)
+        if ema_down == 0:
+            return 100.0
+        return 100 - 100 / (1 + ema_up / ema_down)
+
+
+class MACDState:
+    def __init__(self, fast=12, slow=26, signal=9):
+        self.fast = EMAState.from_span(fast)
+        self.slow = EMAState.from_span(slow)
+        self.signal = EMAState.from_span(signal)
+
+    def update(self, close):
+        macd = self.fast.update(close) - self.slow.update(close)
+        # The signal line starts with the first defined MACD value
+        signal = self.signal.update(macd) if not math.isnan(macd) else NAN
+        return macd, signal, macd - signal
+
+
+class IndicatorState:
+    """Running state for every column in STREAMING_COLUMNS."""
+
+    def __init__(self):
+        self.sma_30 = RollingWindow(30)
+        self.sma_100 = RollingWindow(100)
+        self.ema_20 = EMAState.from_span(20)
+        self.ema_50 = EMAState.from_span(50)
+        self.rsi = RSIState(14)
+        self.macd = MACDState()
+        self.bollinger = RollingWindow(20)
+        self.atr = WilderATRState(14)
+        self.stoch_high = RollingWindow(14)
+        self.stoch_low = RollingWindow(14)
+        self.obv = 0.0
+        self.cmf_flow = RollingWindow(20)
+        self.cmf_volume = RollingWindow(20)
+        self.aroon_high = RollingWindow(26)
+        self.aroon_low = RollingWindow(26)
+        self.prev_close = None
+        self.last_date = None
+        self.last_close = None
+        self.rows = 0
+
+    def update(self, date, open_, high, low, close, volume):
+        """Consume one daily bar and return its feature values in column order."""
+        prev_close = self.prev_close
+        diff = close - prev_close if prev_close is not None else NAN
+
+        self.sma_30.update(close)
+        self.sma_100.update(close)
+        self.bollinger.update(close)
+        rsi = self.rsi.update(diff)
+        macd, signal, histogram = self.macd.update(close)
+
+        if prev_close is None:
+            true_range = high - low
+        else:
+            true_range = max(high - low, abs(high - prev_close), abs(low - prev_close))
+        atr = self.atr.update(true_range)
+
+        self.stoch_high.update(high)
+        self.stoch_low.update(low)
+        lowest, highest = self.stoch_low.min(), self.stoch_high.max()
+        stoch = 100 * (close - lowest) / (highest - lowest) if highest != lowest else NAN
+
+        if prev_close is not None and close < prev_close:
+            self.obv -= volume
+        else:
+            self.obv += volume
+
+        hl = high - low
+        mfv = ((close - low) - (high - close)) / hl if hl != 0 else 0.0
+        self.cmf_flow.update(mfv * volume)
+        self.cmf_volume.update(volume)
+        volume_sum = self.cmf_volume.sum()
+        cmf = self.cmf_flow.sum() / volume_sum if volume_sum else NAN
+
+        self.aroon_high.update(high)
+        self.aroon_low.update(low)
+        if self.aroon_high.full:
+            window = self.aroon_high.window - 1
+            aroon_up = (window - self.aroon_high.bars_since_max()) / window * 100
+            aroon_down = (window - self.aroon_low.bars_since_min()) / window * 100
+        else:
+            aroon_up = aroon_down = NAN
+
+        mean, std = self.bollinger.mean(), self.bollinger.std()
+        self.prev_close = close
+        self.last_date = date
+        self.last_close = close
+        self.rows += 1
+        return [
+            self.sma_30.mean(), self.sma_100.mean(),
+            self.ema_20.update(close), self.ema_50.update(close),
+            rsi, macd, signal, histogram,
+            mean + 2 * std, mean - 2 * std, atr,
+            stoch, self.obv, cmf,
+            aroon_up, aroon_down,
+        ]
+
+    def extend(self, data):
+        """Consume every bar of an OHLCV frame; returns the new feature rows."""
+        rows = [
+            self.update(date, *bar)
+            for date, bar in zip(data.index, data[['Open', 'High', 'Low', 'Close', 'Volume']].itertuples(index=False))
+        ]
+        return pd.DataFrame(rows, index=data.index, columns=STREAMING_COLUMNS, dtype=float)
+
+
+class IndicatorStore:
+    """Per-symbol indicator state and feature rows, in memory and on disk.
+
+    Recently used symbols stay in an in-process LRU. On disk the state is a
+    small pickle and the feature rows an append-only binary file whose valid
+    length is the state's row count, so a new bar costs one appended row and
+    a rewrite of the state, not of the whole history.
+    """
+
+    def __init__(self, root=DEFAULT_STATE_DIR, max_entries=INDICATOR_CACHE_SIZE):
+        self.root = root
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._entries_lock = threading.Lock()
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def _paths(self, symbol):
+        base = os.path.join(self.root, symbol.replace('/', '_'))
+        return base + '.state.pkl', base + '.features.bin'
+
+    @contextmanager
+    def _lock(self, symbol):
+        """Serialize updates of a symbol across threads and processes."""
+        with self._locks_guard:
+            lock = self._locks.setdefault(symbol, threading.Lock())
+        with lock, file_lock(os.path.join(self.root, symbol.replace('/', '_') + '.lock')):
+            yield
+
+    def _load_state(self, symbol):
+        path = self._paths(symbol)[0]
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'rb') as f:
+                return pickle.load(f)
+        except Exception as e:
+            logger.warning(f'Discarding unreadable indicator state for {symbol}: {e}')
+            return None
+
+    def _load(self, symbol):
+        state = self._load_state(symbol)
+        if state is None:
+            return None
+        try:
+            records = np.fromfile(self._paths(symbol)[1], dtype=FEATURE_DTYPE, count=state.rows)
+        except Exception as e:
+            logger.warning(f'Discarding unreadable indicator features for {symbol}: {e}')
+            return None
+        if len(records) < state.rows:
+            logger.warning(f'Discarding incomplete indicator features for {symbol}')
+            return None
+        features = pd.DataFrame({column: records[column] for column in STREAMING_COLUMNS},
+                                index=pd.DatetimeIndex(records['Date'], name='Date'))
+        return state, features
+
+    @staticmethod
+    def _records(features):
+        records = np.empty(len(features), dtype=FEATURE_DTYPE)
+        records['Date'] = features.index.values
+        for column in STREAMING_COLUMNS:
+            records[column] = features[column].to_numpy(dtype=float)
+        return records
+
+    def _save(self, symbol, state, features, appended):
+        """Persist `state` and `features`, of which only the last `appended` rows are new."""
+        state_path, features_path = self._paths(symbol)
+        os.makedirs(self.root, exist_ok=True)
+        stored = self._load_state(symbol)
+        if stored is not None and stored.rows == state.rows and stored.last_date == state.last_date:
+            return  # Another process already stored these bars
+        start = len(features) - appended
+        if (stored is not None and start > 0 and stored.rows == start
+                and stored.last_date == features.index[start - 1] and os.path.exists(features_path)):
+            with open(features_path, 'r+b') as f:
+                # Rows past the stored count are left over from an interrupted write
+                f.truncate(start * FEATURE_DTYPE.itemsize)
+                f.seek(0, os.SEEK_END)
+                self._records(features.iloc[start:]).tofile(f)
+        else:
+            with atomic_write(features_path, 'wb') as f:
+                self._records(features).tofile(f)
+        with atomic_write(state_path, 'wb') as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def _remember(self, symbol, state, features):
+        with self._entries_lock:
+            self._entries[symbol] = (state, features)
+            self._entries.move_to_end(symbol)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    @staticmethod
+    def _matches(state, data):
+        """The stored state is reusable if `data` extends the bars it was built from."""
+        if state.last_date is None or state.last_date not in data.index:
+            return False
+        position = data.index.get_loc(state.last_date)
+        return position + 1 == state.rows and data['Close'].iloc[position] == state.last_close
+
+    def features(self, symbol, data):
+        """Feature rows for every bar in `data`, processing only unseen bars."""
+        with self._lock(symbol):
+            with self._entries_lock:
+                entry = self._entries.pop(symbol, None)
+            if entry is None or not self._matches(entry[0], data):
+                entry = self._load(symbol)
+            if entry is not None and self._matches(entry[0], data):
+                state, features = entry
+                new_bars = data[data.index > state.last_date]
+                if not new_bars.empty:
+                    features = pd.concat([features, state.extend(new_bars)])
+            else:
+                state = IndicatorState()
+                features = state.extend(data)
+                new_bars = data
+            if not new_bars.empty:
+                self._save(symbol, state, features, len(new_bars))
+            # Only re-added once complete, so a failed update never leaves a half-extended state behind
+            self._remember(symbol, state, features)
+            return features
+
+    def discard(self, symbol):
+        """Forget the state and feature rows of a symbol, in memory and on disk."""
+        with self._lock(symbol):
+            with self._entries_lock:
+                self._entries.pop(symbol, None)
+            for path in self._paths(symbol):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+
+_store = None
+
+
+def get_indicator_store():
+    global _store
+    if _store is None:
+        _store = IndicatorStore()
+    return _store
@@ -0,0 +1,98 @@
+"""Response encoding and Accept-header negotiation of FastJSONProvider."""
+import json
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+import pytest
+from flask import Flask, jsonify
+
+import encoders
+from encoders import ARROW_MIMETYPE, JSON_MIMETYPE, MSGPACK_MIMETYPE, FastJSONProvider
+
+HISTORY = pd.DataFrame(
+    {'Close': np.array([1.5, 2.5, 3.5]), 'Volume': np.array([10, 20, 30], dtype=np.int64)},
+    index=pd.DatetimeIndex(['2024-01-01', '2024-01-02', '2024-01-03'], name='Date'),
+)
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    app.json = FastJSONProvider(app)
+
+    @app.route('/history')
+    def history():
+        return jsonify({
+            'stock_history': {'Date': HISTORY.index, 'Close': HISTORY['Close'].to_numpy()},
+            'symbol': 'AAA',
+            'last_price': np.float64(3.5),
+        })
+
+    @app.route('/scalar')
+    def scalar():
+        return jsonify({'price': np.float32(1.25), 'change': Decimal('0.5')})
+
+    return app.test_client()
+
+
+def test_json_by_default(client):
+    response = client.get('/history')
+    assert response.mimetype == JSON_MIMETYPE
+    assert response.get_json() == {
+        'stock_history': {'Date': ['2024-01-01T00:00:00', '2024-01-02T00:00:00', '2024-01-03T00:00:00'],
+                          'Close': [1.5, 2.5, 3.5]},
+        'symbol': 'AAA',
+        'last_price': 3.5,
+    }
+
+
+def test_falls_back_to_flask_default_encoding(client):
+    assert client.get('/scalar').get_json() == {'price': 1.25, 'change': '0.5'}
+
+
+def test_msgpack(client):
+    msgpack = pytest.importorskip('msgpack')
+    response = client.get('/history', headers={'Accept': MSGPACK_MIMETYPE})
+    assert response.mimetype == MSGPACK_MIMETYPE
+    assert 'Accept' in response.vary
+    assert msgpack.unpackb(response.data) == client.get('/history').get_json()
+
+
+def test_arrow_table_with_metadata(client):
+    pa = pytest.importorskip('pyarrow')
+    response = client.get('/history', headers={'Accept': ARROW_MIMETYPE})
+    assert response.mimetype == ARROW_MIMETYPE
+    table = pa.ipc.open_stream(response.data).read_all()
+    assert table.column('Close').to_pylist() == [1.5, 2.5, 3.5]
+    metadata = {key.decode(): value.decode() for key, value in table.schema.metadata.items()}
+    assert metadata['table'] == 'stock_history'
+    assert json.loads(metadata['symbol']) == 'AAA'
+    assert json.loads(metadata['last_price']) == 3.5
+
+
+def test_non_tabular_arrow_request_gets_json(client):
+    pytest.importorskip('pyarrow')
+    response = client.get('/scalar', headers={'Accept': ARROW_MIMETYPE})
+    assert response.mimetype == JSON_MIMETYPE
+    assert response.get_json() == {'price': 1.25, 'change': '0.5'}
+
+
+def test_quality_values_are_respected(client):
+    pytest.importorskip('msgpack')
+    accept = f'{MSGPACK_MIMETYPE};q=0.5, {JSON_MIMETYPE}'
+    assert client.get('/history', headers={'Accept': accept}).mimetype == JSON_MIMETYPE
+
+
+def test_unavailable_format_gets_json(client, monkeypatch):
+    monkeypatch.setattr(encoders, 'msgpack', None)
+    response = client.get('/history', headers={'Accept': MSGPACK_MIMETYPE})
+    assert response.mimetype == JSON_MIMETYPE
+
+
+def test_dataframe_is_column_oriented():
+    assert encoders.to_builtin(HISTORY.reset_index()) == {
+        'Date': ['2024-01-01T00:00:00', '2024-01-02T00:00:00', '2024-01-03T00:00:00'],
+        'Close': [1.5, 2.5, 3.5],
+        'Volume': [10, 20, 30],
+    }
@@ -0,0 +1,66 @@
+"""Both HTTP clients against a local stub server."""
+import pytest
+
+from benchmarks import ReplayServer, chart_payload, make_fixture_ohlcv
+from http_client import AsyncHTTPClient, FetchError, SessionHTTPClient, aiohttp
+from price_store import YahooChartFetcher, chart_to_ohlcv
+
+CLIENTS = [
+    pytest.param(AsyncHTTPClient, id='aiohttp',
+                 marks=pytest.mark.skipif(aiohttp is None, reason='aiohttp is not installed')),
+    pytest.param(SessionHTTPClient, id='requests'),
+]
+
+
+@pytest.fixture
+def server():
+    server = ReplayServer({'/ok': {'value': 1}}, latency=0.01)
+    yield server
+    server.close()
+
+
+@pytest.fixture(params=CLIENTS)
+def client(request):
+    client = request.param(per_host=4, timeout=2)
+    yield client
+    client.close()
+
+
+def test_get_json(server, client):
+    assert client.get_json(server.url + '/ok') == {'value': 1}
+
+
+def test_error_status_raises_fetch_error(server, client):
+    with pytest.raises(FetchError):
+        client.get_json(server.url + '/missing')
+
+
+def test_timeout_raises_fetch_error(client):
+    server = ReplayServer({'/slow': {}}, latency=1)
+    try:
+        with pytest.raises(FetchError):
+            client.get_json(server.url + '/slow', timeout=0.2)
+    finally:
+        server.close()
+
+
+def test_get_json_many_reuses_connections(server, client):
+    requests = [(server.url + '/ok', {'i': i}) for i in range(20)] + [(server.url + '/missing', None)]
+    results = client.get_json_many(requests)
+    assert results[:20] == [{'value': 1}] * 20
+    assert isinstance(results[20], FetchError)
+    # At most `per_host` connections, kept alive across the batch
+    assert server.connections <= 4
+
+
+def test_chart_fetcher(client):
+    fixtures = {f'SYM{i}.NS': make_fixture_ohlcv(200, seed=i) for i in range(3)}
+    server = ReplayServer({f'/chart/{symbol}': chart_payload(data) for symbol, data in fixtures.items()}, latency=0)
+    try:
+        fetcher = YahooChartFetcher(url=server.url + '/chart/{symbol}', client=client)
+        frames = fetcher.fetch_many(list(fixtures) + ['MISSING.NS'])
+    finally:
+        server.close()
+    assert set(frames) == set(fixtures)
+    for symbol, data in fixtures.items():
+        assert frames[symbol].equals(chart_to_ohlcv(chart_payload(data)))
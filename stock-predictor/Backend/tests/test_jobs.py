@@ -0,0 +1,148 @@
+"""Request coalescing in SingleFlight and the background job queue."""
+import threading
+import time
+
+import pytest
+
+import jobs
+from jobs import DONE, FAILED, JobQueue
+from shared_cache import SharedCache
+from singleflight import SingleFlight
+
+
+def run_concurrently(count, func):
+    results = [None] * count
+
+    def call(i):
+        try:
+            results[i] = func()
+        except Exception as e:
+            results[i] = e
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads, results
+
+
+def test_singleflight_shares_one_execution():
+    group = SingleFlight('test')
+    release = threading.Event()
+    executions = []
+
+    def work():
+        executions.append(1)
+        release.wait(5)
+        return 42
+
+    threads, results = run_concurrently(5, lambda: group.do('key', work))
+    while group.stats()['calls'] < 5:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert results == [42] * 5
+    assert len(executions) == 1
+    assert group.stats() == {'calls': 5, 'executions': 1, 'shared': 4, 'in_flight': 0}
+
+
+def test_singleflight_shares_exceptions_and_forgets_finished_calls():
+    group = SingleFlight('test')
+    release = threading.Event()
+
+    def fail():
+        release.wait(5)
+        raise ValueError('boom')
+
+    threads, results = run_concurrently(3, lambda: group.do('key', fail))
+    while group.stats()['calls'] < 3:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert all(isinstance(result, ValueError) for result in results)
+    assert group.do('key', lambda: 'again') == 'again'
+    assert group.stats()['executions'] == 2
+
+
+def wait_until_done(job, timeout=5):
+    deadline = time.time() + timeout
+    while not job.done and time.time() < deadline:
+        job.wait_for_events(len(job.events), timeout=0.1)
+    assert job.done
+
+
+def test_job_queue_dedups_in_flight_jobs():
+    queue = JobQueue(max_workers=2)
+    release = threading.Event()
+    calls = []
+
+    def work(job, value):
+        calls.append(value)
+        job.publish('progress', {'value': value})
+        release.wait(5)
+        return value * 2
+
+    first = queue.submit('key', work, 21)
+    second = queue.submit('key', work, 21)
+    other = queue.submit('other', work, 1)
+    assert first is second and first is not other
+    release.set()
+    wait_until_done(first)
+    wait_until_done(other)
+
+    assert first.status == DONE and first.result == 42
+    assert sorted(calls) == [1, 21]
+    assert [event['event'] for event in first.events] == ['running', 'progress', 'done']
+    # A finished job is not reused
+    third = queue.submit('key', work, 21)
+    assert third is not first
+    wait_until_done(third)
+
+
+def test_failed_job():
+    queue = JobQueue(max_workers=1)
+
+    def fail(job):
+        raise RuntimeError('no data')
+
+    job = queue.submit('key', fail)
+    wait_until_done(job)
+    assert job.status == FAILED and job.error == 'no data'
+    assert queue.get(job.id) is job
+
+
+def test_job_is_followed_from_another_worker(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, 'JOB_POLL_INTERVAL', 0.01)
+    path = str(tmp_path / 'shared.sqlite3')
+    worker, other_worker = JobQueue(shared=SharedCache(path, 'jobs')), JobQueue(shared=SharedCache(path, 'jobs'))
+    release = threading.Event()
+
+    def work(job):
+        job.publish('data_loaded', {'rows': 10})
+        release.wait(5)
+        return [1.0, 2.0]
+
+    job = worker.submit('key', work)
+    remote = other_worker.get(job.id)
+    assert remote is not None and remote.id == job.id
+    assert other_worker.get('unknown') is None
+
+    seen = []
+    for _ in range(100):
+        seen += remote.wait_for_events(len(seen), timeout=0.1)
+        if len(seen) == 2:
+            release.set()
+        if remote.done:
+            break
+    seen += remote.wait_for_events(len(seen), timeout=0)
+
+    assert [event['event'] for event in seen] == ['running', 'data_loaded', 'done']
+    assert remote.to_dict()['result'] == [1.0, 2.0]
+
+
+@pytest.mark.parametrize('shared', [False, True])
+def test_unknown_job(tmp_path, shared):
+    queue = JobQueue(shared=SharedCache(str(tmp_path / 'shared.sqlite3'), 'jobs') if shared else None)
+    assert queue.get('missing') is None
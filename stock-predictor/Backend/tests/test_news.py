@@ -0,0 +1,64 @@
+"""News fetching with retries and the shared-cache refresher, against a stub feed."""
+import pytest
+
+import news_analysis
+from benchmarks import ReplayServer
+from news_analysis import NewsRefresher, fetch_and_cache_news, get_news_metrics
+from shared_cache import SharedCache
+
+ARTICLES = [{'Title': 'Analysts say Infosys is a good buy', 'URL': 'https://example.com/1'}]
+
+
+@pytest.fixture
+def server():
+    server = ReplayServer({'/news': ARTICLES, '/not-a-list': {'error': 'quota'}}, latency=0)
+    yield server
+    server.close()
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    news_analysis._swap_cache([])
+    yield
+    news_analysis._swap_cache([])
+
+
+def test_fetch_and_cache_news(server):
+    version, refreshes = get_news_metrics()['version'], news_analysis.news_metrics['refresh_count']
+    assert fetch_and_cache_news(url=server.url + '/news')
+    assert news_analysis.news_articles_cache == ARTICLES
+    assert get_news_metrics()['version'] != version
+    assert news_analysis.news_metrics['refresh_count'] == refreshes + 1
+
+
+@pytest.mark.parametrize('path', ['/missing', '/not-a-list'])
+def test_failures_keep_the_previous_articles(server, path):
+    fetch_and_cache_news(url=server.url + '/news')
+    failures = news_analysis.news_metrics['failure_count']
+    assert not fetch_and_cache_news(max_retries=1, backoff=0, url=server.url + path)
+    assert news_analysis.news_articles_cache == ARTICLES
+    assert news_analysis.news_metrics['failure_count'] == failures + 2
+    assert news_analysis.news_metrics['consecutive_failures'] == 2
+
+
+def test_only_the_leader_fetches(server, tmp_path, monkeypatch):
+    path = str(tmp_path / 'shared.sqlite3')
+    monkeypatch.setattr(news_analysis, 'SHARED_CACHE_PATH', path)
+    monkeypatch.setattr(news_analysis, 'NEWS_API_URL', server.url + '/news')
+    # Two workers: each holds its own lock file handle and cache connection
+    leader = NewsRefresher(ttl=60, shared=SharedCache(path, 'news'))
+    follower = NewsRefresher(ttl=60, shared=SharedCache(path, 'news'))
+    try:
+        refreshes = news_analysis.news_metrics['refresh_count']
+        leader._sync()
+        assert news_analysis.news_articles_cache == ARTICLES
+        news_analysis._swap_cache([])
+
+        follower._sync()
+        assert news_analysis.news_articles_cache == ARTICLES
+        assert news_analysis.news_metrics['refresh_count'] == refreshes + 1
+        assert not follower._is_leader()
+    finally:
+        for refresher in (leader, follower):
+            if refresher._lock_file is not None:
+                refresher._lock_file.close()
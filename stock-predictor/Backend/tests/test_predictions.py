@@ -0,0 +1,64 @@
+"""Serving stored predictions only while they match the stored price history."""
+import time
+from datetime import date
+
+import pytest
+
+import predictions
+import price_store
+from benchmarks import make_fixture_ohlcv
+from predictions import DiskPredictionStore, get_prediction, get_predictions, is_fresh, make_record
+from price_store import PriceStore
+
+RESULT = {'short_term': [1.0, 0.9, 1.1, 1.0], 'long_term': 1.2, 'current_price': 1.0}
+
+
+@pytest.fixture
+def stores(tmp_path, monkeypatch):
+    prices = PriceStore(root=str(tmp_path / 'prices'))
+    monkeypatch.setattr(price_store, '_store', prices)
+    monkeypatch.setattr(predictions, '_store', DiskPredictionStore(str(tmp_path / 'predictions')))
+    monkeypatch.setattr(predictions, 'get_quotes', lambda symbols: {symbol: 2.0 for symbol in symbols})
+    live = []
+
+    def predict_batch(symbols):
+        live.extend(symbols)
+        return {symbol: dict(RESULT, current_price=3.0) for symbol in symbols}, {}
+    monkeypatch.setattr(predictions, 'predict_batch', predict_batch)
+    return prices, live
+
+
+def store_bars(prices, symbol, end):
+    bars = make_fixture_ohlcv(50)
+    bars = bars[bars.index <= end]
+    prices._write(symbol + '.NS', bars, date.today().isoformat())
+
+
+def test_is_fresh():
+    record = make_record('AAA', RESULT, last_bar='2024-12-02')
+    assert is_fresh(record)
+    assert is_fresh(record, last_bar='2024-12-02')
+    assert not is_fresh(record, last_bar='2024-12-03')
+    assert not is_fresh(make_record('AAA', RESULT, computed_at=time.time() - 10), max_age=5)
+    assert not is_fresh(make_record('AAA', RESULT), last_bar='2024-12-02')
+
+
+def test_served_until_a_newer_bar_is_stored(stores):
+    prices, live = stores
+    store_bars(prices, 'AAA', '2024-12-02')
+    predictions.get_prediction_store().put_many([make_record('AAA', RESULT, last_bar='2024-12-02')])
+
+    results, errors = get_predictions(['AAA'])
+    assert live == [] and errors == {}
+    assert results['AAA']['current_price'] == 2.0
+    assert get_prediction('AAA', 'long_term') == 1.2
+
+    store_bars(prices, 'AAA', '2024-12-03')
+    assert get_prediction('AAA', 'long_term') is None
+    results, _ = get_predictions(['AAA'])
+    assert live == ['AAA']
+    assert results['AAA']['current_price'] == 3.0
+    # The live result is written back with the bar it was made from
+    assert predictions.get_prediction_store().get(['AAA'])['AAA']['last_bar'] == '2024-12-03'
+    get_predictions(['AAA'])
+    assert live == ['AAA']
@@ -0,0 +1,154 @@
+"""Incremental refreshes of the on-disk price store."""
+from datetime import date
+
+import pandas as pd
+import pytest
+
+import price_store
+from benchmarks import make_fixture_ohlcv
+from http_client import FetchError
+from price_store import CsvFixtureFetcher, PriceStore
+
+SYMBOL = 'AAA.NS'
+
+
+class Today:
+    """Stand-in for `datetime.date` whose today() the test controls."""
+    value = date(2024, 12, 2)
+
+    @classmethod
+    def today(cls):
+        return cls.value
+
+
+@pytest.fixture
+def today(monkeypatch):
+    monkeypatch.setattr(price_store, 'date', Today)
+    monkeypatch.setattr(Today, 'value', date(2024, 12, 2))
+    return Today
+
+
+@pytest.fixture
+def fixtures(tmp_path):
+    directory = tmp_path / 'fixtures'
+    directory.mkdir()
+
+    def write(data, symbol=SYMBOL):
+        data.to_csv(directory / f'{symbol}.csv')
+    return directory, write
+
+
+def make_store(tmp_path, fixtures):
+    return PriceStore(root=str(tmp_path / 'prices'), fetcher=CsvFixtureFetcher(str(fixtures[0])))
+
+
+def test_refresh_appends_new_bars(tmp_path, fixtures, today):
+    bars = make_fixture_ohlcv(300)
+    fixtures[1](bars)
+    store = make_store(tmp_path, fixtures)
+    rewritten = []
+    store.rewrite_listeners.append(rewritten.append)
+
+    today.value = date(2024, 12, 2)
+    assert store.refresh(SYMBOL).index[-1] == pd.Timestamp('2024-11-29')
+    today.value = date(2024, 12, 6)
+    stored = store.refresh(SYMBOL)
+
+    expected = bars[bars.index < pd.Timestamp('2024-12-06')]
+    pd.testing.assert_frame_equal(stored, expected, check_freq=False, check_index_type=False)
+    assert rewritten == []
+
+
+def test_revised_history_is_downloaded_again(tmp_path, fixtures, today):
+    bars = make_fixture_ohlcv(300)
+    fixtures[1](bars)
+    store = make_store(tmp_path, fixtures)
+    other_process = make_store(tmp_path, fixtures)
+    rewritten, seen_elsewhere = [], []
+    store.rewrite_listeners.append(rewritten.append)
+    other_process.rewrite_listeners.append(seen_elsewhere.append)
+
+    today.value = date(2024, 12, 2)
+    store.refresh(SYMBOL)
+    other_process.load(SYMBOL)
+    # A 1:2 split rescales every past price upstream
+    split = bars.copy()
+    split[['Open', 'High', 'Low', 'Close']] /= 2
+    fixtures[1](split)
+    today.value = date(2024, 12, 6)
+    stored = store.refresh(SYMBOL)
+
+    expected = split[split.index < pd.Timestamp('2024-12-06')]
+    pd.testing.assert_frame_equal(stored, expected, check_freq=False, check_index_type=False)
+    assert rewritten == [SYMBOL]
+    other_process.load(SYMBOL)
+    assert seen_elsewhere == [SYMBOL]
+
+
+def test_refresh_many_downloads_revised_symbols_again(tmp_path, fixtures, today):
+    revised, unchanged = make_fixture_ohlcv(300, seed=1), make_fixture_ohlcv(300, seed=2)
+    fixtures[1](revised, 'AAA.NS')
+    fixtures[1](unchanged, 'BBB.NS')
+    store = make_store(tmp_path, fixtures)
+    rewritten = []
+    store.rewrite_listeners.append(rewritten.append)
+
+    today.value = date(2024, 12, 2)
+    store.refresh_many(['AAA.NS', 'BBB.NS'])
+    # Only one bar changes, inside the refetched overlap
+    revised.iloc[-25, revised.columns.get_loc('Close')] *= 1.1
+    fixtures[1](revised, 'AAA.NS')
+    today.value = date(2024, 12, 6)
+    stored = store.refresh_many(['AAA.NS', 'BBB.NS'])
+
+    assert rewritten == ['AAA.NS']
+    for symbol, bars in [('AAA.NS', revised), ('BBB.NS', unchanged)]:
+        expected = bars[bars.index < pd.Timestamp('2024-12-06')]
+        pd.testing.assert_frame_equal(stored[symbol], expected, check_freq=False, check_index_type=False)
+
+
+class FailingFetcher:
+    """Wraps a fetcher and fails the next `failures` downloads."""
+
+    def __init__(self, fetcher, failures):
+        self.fetcher = fetcher
+        self.failures = failures
+
+    def fetch(self, symbol, start=None):
+        if self.failures:
+            self.failures -= 1
+            raise FetchError(f'Price download failed for {symbol}')
+        return self.fetcher.fetch(symbol, start=start)
+
+    def fetch_many(self, symbols, start=None):
+        if self.failures:
+            self.failures -= 1
+            return {}
+        return self.fetcher.fetch_many(symbols, start=start)
+
+
+def test_failed_download_is_retried(tmp_path, fixtures, today):
+    bars = make_fixture_ohlcv(300)
+    fixtures[1](bars)
+    store = make_store(tmp_path, fixtures)
+    today.value = date(2024, 12, 2)
+    store.refresh(SYMBOL)
+
+    store.fetcher = FailingFetcher(store.fetcher, failures=1)
+    today.value = date(2024, 12, 6)
+    # The stored bars are served and the symbol is not marked fresh
+    assert store.refresh(SYMBOL).index[-1] == pd.Timestamp('2024-11-29')
+    assert store._read_meta(SYMBOL)['fetched_on'] == '2024-12-02'
+
+    assert store.refresh(SYMBOL).index[-1] == pd.Timestamp('2024-12-05')
+    assert store._read_meta(SYMBOL)['fetched_on'] == '2024-12-06'
+
+
+def test_failed_first_download_stores_nothing(tmp_path, fixtures, today):
+    fixtures[1](make_fixture_ohlcv(300))
+    store = make_store(tmp_path, fixtures)
+    store.fetcher = FailingFetcher(store.fetcher, failures=2)
+
+    assert store.get_history(SYMBOL).empty
+    assert store.refresh_many([SYMBOL]) == {SYMBOL: None}
+    assert store.get_history(SYMBOL).index[-1] == pd.Timestamp('2024-11-29')
@@ -0,0 +1,89 @@
+"""Incremental indicator state and its on-disk store."""
+import os
+
+import numpy as np
+import pytest
+
+from benchmarks import make_fixture_ohlcv
+from indicators import compute_indicators
+from streaming_indicators import FEATURE_DTYPE, STREAMING_COLUMNS, IndicatorState, IndicatorStore
+
+SYMBOL = 'AAA.NS'
+
+
+def full_recompute(data):
+    return compute_indicators(data, STREAMING_COLUMNS)
+
+
+def assert_features_match(features, data):
+    assert features.index.equals(data.index)
+    assert np.allclose(features[STREAMING_COLUMNS], full_recompute(data), rtol=1e-9, atol=1e-8, equal_nan=True)
+
+
+def features_file(store):
+    return store._paths(SYMBOL)[1]
+
+
+@pytest.fixture
+def data():
+    return make_fixture_ohlcv(400)
+
+
+def test_state_matches_full_recompute(data):
+    state = IndicatorState()
+    state.extend(data.iloc[:300])
+    features = state.extend(data.iloc[300:])
+    assert np.allclose(features, full_recompute(data).iloc[300:], rtol=1e-9, atol=1e-8, equal_nan=True)
+
+
+def test_new_bar_is_appended_and_reloaded(tmp_path, data):
+    root = str(tmp_path)
+    IndicatorStore(root).features(SYMBOL, data.iloc[:-1])
+    size = os.path.getsize(features_file(IndicatorStore(root)))
+
+    features = IndicatorStore(root).features(SYMBOL, data)
+
+    assert_features_match(features, data)
+    assert os.path.getsize(features_file(IndicatorStore(root))) == size + FEATURE_DTYPE.itemsize
+    # A fresh process reads the appended rows back
+    reloaded = IndicatorStore(root)
+    assert_features_match(reloaded._load(SYMBOL)[1], data)
+
+
+def test_interrupted_append_is_truncated_on_resume(tmp_path, data):
+    root = str(tmp_path)
+    IndicatorStore(root).features(SYMBOL, data.iloc[:-1])
+    # Rows written past the stored count by an append that never saved its state
+    with open(features_file(IndicatorStore(root)), 'ab') as f:
+        f.write(b'\xff' * FEATURE_DTYPE.itemsize * 3)
+
+    features = IndicatorStore(root).features(SYMBOL, data)
+
+    assert_features_match(features, data)
+    assert os.path.getsize(features_file(IndicatorStore(root))) == len(data) * FEATURE_DTYPE.itemsize
+    assert_features_match(IndicatorStore(root)._load(SYMBOL)[1], data)
+
+
+def test_changed_history_is_recomputed(tmp_path, data):
+    store = IndicatorStore(str(tmp_path))
+    store.features(SYMBOL, data)
+    revised = data.copy()
+    revised[['Open', 'High', 'Low', 'Close']] /= 2
+    assert_features_match(store.features(SYMBOL, revised), revised)
+    assert_features_match(IndicatorStore(str(tmp_path)).features(SYMBOL, revised), revised)
+
+
+def test_discard(tmp_path, data):
+    store = IndicatorStore(str(tmp_path))
+    store.features(SYMBOL, data)
+    store.discard(SYMBOL)
+    assert store._load(SYMBOL) is None
+    assert SYMBOL not in store._entries
+
+
+def test_memory_is_bounded(tmp_path, data):
+    store = IndicatorStore(str(tmp_path), max_entries=2)
+    for symbol in ['A', 'B', 'C']:
+        store.features(symbol, data)
+    assert list(store._entries) == ['B', 'C']
+    assert_features_match(store.features('A', data), data)
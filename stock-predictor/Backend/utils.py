@@ -1,5 +1,21 @@
+import csv
+import logging
+import os
+import re
+import threading
+import time
+from collections import namedtuple
 import pandas as pd
 
+logger = logging.getLogger(__name__)
+
+DEFAULT_COMPANY_NAMES_CSV = os.getenv(
+    'COMPANY_NAMES_CSV',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'full_company_names.csv')
+)
+COMPANY_SUFFIXES = ['limited', 'ltd', 'corp', 'inc', 'llc']
+_TOKEN_PATTERN = re.compile(r"[a-z0-9&]+")
+
 def preprocess_company_name(name):
     suffixes = ['limited', 'ltd', 'corp', 'inc', 'llc']
     for suffix in suffixes:
@@ -12,11 +28,108 @@ def load_mappings(csv_path):
     df['CompanyName'] = df['CompanyName'].apply(preprocess_company_name)
     return dict(zip(df['CompanyName'].str.lower(), df['Symbol']))
 
+def tokenize(text):
+    return _TOKEN_PATTERN.findall(text.lower())
+
+class CompanyMatcher:
+    """Word-level index of company names for matching news headlines.
+
+    Names are split into word tokens with trailing suffixes such as
+    'Limited' removed, and indexed by their first token. A headline is
+    scanned once, and at each word only names starting with that word are
+    compared, so matching no longer loops over the whole company list.
+    """
+
+    def __init__(self, mappings):
+        self._index = {}
+        for company_name, symbol in mappings.items():
+            tokens = tokenize(company_name)
+            while tokens and tokens[-1] in COMPANY_SUFFIXES:
+                tokens.pop()
+            if tokens:
+                self._index.setdefault(tokens[0], []).append((tuple(tokens), symbol))
+        # Prefer the longest name starting at a given word
+        for candidates in self._index.values():
+            candidates.sort(key=lambda candidate: -len(candidate[0]))
+
+    def find_all(self, title):
+        """Symbols of every company named in the title, in order of appearance."""
+        tokens = tokenize(title)
+        symbols = []
+        i = 0
+        while i < len(tokens):
+            step = 1
+            for name_tokens, symbol in self._index.get(tokens[i], ()):
+                if tuple(tokens[i:i + len(name_tokens)]) == name_tokens:
+                    if symbol not in symbols:
+                        symbols.append(symbol)
+                    step = len(name_tokens)
+                    break
+            i += step
+        return symbols
+
+def extract_stock_symbols_from_title(title, matcher):
+    return matcher.find_all(title)
+
 def extract_stock_symbol_from_title(title, mappings):
-    suffixes = ['limited', 'ltd', 'corp', 'inc', 'llc']
-    for company_name, symbol in mappings.items():
-        for suffix in suffixes:
-            company_name = company_name.replace(suffix, '').strip()
-        if company_name in title:
-            return symbol
-    return None
+    matcher = mappings if isinstance(mappings, CompanyMatcher) else CompanyMatcher(mappings)
+    symbols = matcher.find_all(title)
+    return symbols[0] if symbols else None
+
+
+MappingSnapshot = namedtuple('MappingSnapshot', ['mtime', 'name_to_symbol', 'symbol_to_name', 'matcher'])
+
+class MappingRegistry:
+    """Company name and symbol lookups, reloaded when the CSV file changes.
+
+    The CSV is parsed once into plain dicts plus a CompanyMatcher. The file's
+    mtime is checked at most every `check_interval` seconds; on a change a
+    new snapshot is built and swapped in whole, so readers always see one
+    consistent version.
+    """
+
+    def __init__(self, csv_path=DEFAULT_COMPANY_NAMES_CSV, check_interval=5.0):
+        self.csv_path = csv_path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._next_check = 0.0
+        self._snapshot = self._build(os.path.getmtime(csv_path))
+
+    def _build(self, mtime):
+        name_to_symbol = {}
+        symbol_to_name = {}
+        with open(self.csv_path, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                symbol, company_name = row['Symbol'].strip(), row['CompanyName'].strip()
+                symbol_to_name[symbol] = company_name
+                name_to_symbol[preprocess_company_name(company_name).lower()] = symbol
+        return MappingSnapshot(mtime, name_to_symbol, symbol_to_name, CompanyMatcher(name_to_symbol))
+
+    def snapshot(self):
+        now = time.monotonic()
+        if now >= self._next_check:
+            with self._lock:
+                if now >= self._next_check:
+                    self._next_check = now + self.check_interval
+                    self._reload_if_changed()
+        return self._snapshot
+
+    def _reload_if_changed(self):
+        try:
+            mtime = os.path.getmtime(self.csv_path)
+            if mtime != self._snapshot.mtime:
+                self._snapshot = self._build(mtime)
+                logger.info(f'Reloaded company mappings from {self.csv_path}')
+        except (OSError, KeyError, csv.Error) as e:
+            # Keep serving the previous mappings while the file is being replaced
+            logger.warning(f'Could not reload company mappings: {e}')
+
+    @property
+    def matcher(self):
+        return self.snapshot().matcher
+
+    def name_to_symbol(self, company_name):
+        return self.snapshot().name_to_symbol.get(preprocess_company_name(company_name).lower())
+
+    def symbol_to_name(self, symbol):
+        return self.snapshot().symbol_to_name.get(symbol)
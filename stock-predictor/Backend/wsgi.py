@@ -0,0 +1,9 @@
+"""WSGI entry point for production servers: `gunicorn wsgi:app` (settings in gunicorn.conf.py)."""
+import os
+
+from app import create_app
+
+# A pre-forking server starts the background threads in each worker instead
+start_background = os.getenv('START_BACKGROUND_TASKS', 'True').lower() in ['true', '1', 't']
+
+app = create_app(start_background=start_background)
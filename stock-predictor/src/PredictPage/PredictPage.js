@@ -58,6 +58,20 @@ const PredictPage = () => {
         }
     }, [stockSymbol]);
 
+    // Poll a queued prediction job until it finishes
+    const waitForJob = async (jobId) => {
+        while (true) {
+            const { data: job } = await axios.get(`http://localhost:5000/jobs/${jobId}`);
+            if (job.status === 'done') {
+                return job.result;
+            }
+            if (job.status === 'failed') {
+                throw new Error(job.error);
+            }
+            await new Promise(resolve => setTimeout(resolve, 1000));
+        }
+    };
+
     const handleStockSubmit = async () => {
         setError('');
         setPrediction('');
@@ -67,14 +81,16 @@ const PredictPage = () => {
                 stock_symbol: stockSymbol,
                 term: term
             });
+            // Precomputed predictions come back at once, others as a job to poll
+            const result = response.status === 200 ? response.data : await waitForJob(response.data.job_id);
 
             // Check if the response data contains multiple predictions (short-term case)
-            if (term === 'short_term' && Array.isArray(response.data.prediction)) {
-                const [predictedClose, predictedLow, predictedHigh] = response.data.prediction;
+            if (term === 'short_term' && Array.isArray(result.prediction)) {
+                const [predictedClose, predictedLow, predictedHigh] = result.prediction;
                 setPrediction(`Predicted Close: ₹${predictedClose.toFixed(2)}, Low: ₹${predictedLow.toFixed(2)}, High: ₹${predictedHigh.toFixed(2)}`);
             } else {
                 // Handle long-term case or any other single value prediction
-                setPrediction(`Predicted price: ₹${response.data.prediction.toFixed(2)}`);
+                setPrediction(`Predicted price: ₹${result.prediction.toFixed(2)}`);
             }
         } catch (error) {
             setError('An error occurred while fetching the prediction.');
@@ -37,7 +37,9 @@ const StockInfoPage = () => {
     useEffect(() => {
         const fetchStockData = async () => {
             try {
-                const response = await axios.get(`http://localhost:5000/api/stock/${stockSymbol}`);
+                const response = await axios.get(`http://localhost:5000/api/stock/${stockSymbol}`, {
+                    params: { fields: 'Date,High', points: 500 },
+                });
                 setStockData(response.data);
                 if (!response.data.stock_info) {
                     setError(`Stock not found. Check the name again (e.g., SUZLON, MTNL).`);
@@ -71,7 +73,7 @@ const StockInfoPage = () => {
         return <div>No stock information available for {stockSymbol}</div>;
     }
 
-    if (!stock_history || stock_history.length === 0) {
+    if (!stock_history || !stock_history.Date || stock_history.Date.length === 0) {
         return <div>No historical data available for {stockSymbol}</div>;
     }
 
@@ -84,11 +86,11 @@ const StockInfoPage = () => {
     };
 
     const chartData = {
-        labels: stock_history.map(entry => formatDate(entry.Date)), // Formatted Dates as labels
+        labels: stock_history.Date.map(formatDate), // Formatted Dates as labels
         datasets: [
             {
                 label: 'Highest Price',
-                data: stock_history.map(entry => entry.High),
+                data: stock_history.High,
                 borderColor: 'rgba(75, 192, 192, 1)',
                 backgroundColor: 'rgba(75, 192, 192, 0.2)',
                 fill: true,